@@ -0,0 +1,30 @@
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def tk_root():
+    xvfb = None
+    if not os.environ.get("DISPLAY"):
+        try:
+            from xvfbwrapper import Xvfb
+        except ImportError:
+            pytest.skip("needs a display ($DISPLAY or xvfbwrapper)")
+        xvfb = Xvfb()
+        try:
+            xvfb.start()
+        except OSError as e:
+            pytest.skip("Xvfb: %s" % e)
+    import tkinter
+    try:
+        root = tkinter.Tk()
+    except tkinter.TclError as e:
+        if xvfb is not None:
+            xvfb.stop()
+        pytest.skip(str(e))
+    root.withdraw()
+    yield root
+    root.destroy()
+    if xvfb is not None:
+        xvfb.stop()
@@ -0,0 +1,115 @@
+"""popup `make` functions on a Tcl interpreter without Tk, no display needed"""
+import os
+import time
+import tkinter
+
+from v2.base.server import MSG_LOAD, MSG_CHILDREN
+
+
+class TclLoop(tkinter.Tk):
+
+    def __init__(self):
+        tkinter.Tk.__init__(self, useTk=False)
+        self._quit = False
+
+    def mainloop(self, n=0):
+        while not self._quit:
+            self.tk.dooneevent(0)
+
+    def destroy(self):
+        self._quit = True
+
+
+def reply(value, delay=0.05, server=None):
+    tk = TclLoop()
+
+    def done():
+        server.send(value)
+        server.exit()
+
+    tk.after(int(delay * 1000), done)
+    return tk
+
+
+def count_handoff(handoff, server=None):
+    tk = TclLoop()
+    flat = handoff.open()
+    n = sum(1 for _ in flat.rows())
+    handoff.release()
+
+    def done():
+        server.send(n)
+        server.exit()
+
+    tk.after(10, done)
+    return tk
+
+
+def die(server=None):
+    os._exit(3)
+
+
+def hang(server=None):
+    tk = TclLoop()
+    tk.after(100, time.sleep, 60)
+    return tk
+
+
+def progress(n, server=None):
+    tk = TclLoop()
+
+    def step(i=0):
+        if i < n:
+            server.progress(i)
+            tk.after(20, step, i + 1)
+        else:
+            server.send(n)
+            server.exit()
+
+    tk.after(20, step)
+    return tk
+
+
+def slow(delay, server=None):
+    time.sleep(delay)
+    return reply(delay, 0.01, server)
+
+
+def events(n, server=None):
+    tk = TclLoop()
+
+    def step(i=0):
+        if i < n:
+            server.send_event(("check", "E%i" % i, bool(i % 2)))
+            tk.after(10, step, i + 1)
+        else:
+            server.send(n)
+            server.exit()
+
+    tk.after(10, step)
+    return tk
+
+
+def collect(kind, n, server=None):
+    tk = TclLoop()
+    got = list()
+
+    def handle(obj):
+        got.append(obj)
+        if len(got) == n:
+            server.send(got)
+            server.exit()
+
+    server.handlers[kind] = handle
+    return tk
+
+
+def load(iids, server=None):
+    tk = collect(MSG_CHILDREN, len(iids), server)
+
+    def request():
+        for iid in iids:
+            server.send_message(MSG_LOAD, iid)
+
+    tk.after(10, request)
+    return tk
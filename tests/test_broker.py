@@ -0,0 +1,55 @@
+import sys
+from pickle import PicklingError
+from types import ModuleType
+
+import pytest
+
+from v2.base.broker import TkBgBroker, BrokerRejected
+from v2.base.server import PopupHung
+from tests.popups import reply, die, hang
+
+
+@pytest.mark.parametrize("unix", [False, True])
+def test_limits(unix):
+    with TkBgBroker(concurrency=2, queue_size=3, unix=unix) as broker, broker.client() as client:
+        futures = [client.submit(reply, i, 0.5) for i in range(6)]
+        stats = client.stats(timeout=30)
+        assert (stats["running"], stats["queued"], stats["rejected"]) == (2, 3, 1)
+        with pytest.raises(BrokerRejected):
+            futures[-1].result(30)
+        assert [f.result(30) for f in futures[:-1]] == list(range(5))
+        stats = client.stats(timeout=30)
+        assert (stats["running"], stats["queued"], stats["served"]) == (0, 0, 5)
+
+
+def test_failures():
+    with TkBgBroker(concurrency=1, heartbeat=0.2) as broker, broker.client() as client:
+        with pytest.raises(EOFError):
+            client.submit(die).result(30)
+        with pytest.raises(PopupHung):
+            client.submit(hang).result(30)
+        waiting = client.submit(reply, 0, 30)
+        queued = client.submit(reply, 1)
+        assert queued.cancel()
+        assert waiting.cancel()
+        assert client.submit(reply, 2).result(30) == 2
+        stats = client.stats(timeout=30)
+        assert (stats["failed"], stats["hung"], stats["served"]) == (2, 1, 1)
+
+
+def test_unloadable_make():
+    # importable here only, not in the broker
+    ghost = ModuleType("tests_ghost")
+    exec("def make(server=None):\n    pass", ghost.__dict__)
+    sys.modules["tests_ghost"] = ghost
+    try:
+        with TkBgBroker(concurrency=1) as broker, broker.client() as client:
+            with pytest.raises(EOFError, match="not loadable"):
+                client.submit(ghost.make).result(30)
+            # fails in the caller, nothing is sent
+            with pytest.raises((PicklingError, AttributeError)):
+                client.submit(lambda server=None: None)
+            assert client.submit(reply, 1).result(30) == 1
+            assert client.stats(timeout=30)["failed"] == 1
+    finally:
+        del sys.modules["tests_ghost"]
@@ -0,0 +1,100 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+from pickle import dumps, loads
+
+import pytest
+
+from v2.base.flatstruct import FlatStructure, StructureHandoff, pack_structure
+from v2.base.structure import StructureNode, NOT_LOADED
+
+ROOT = Path(__file__).parent.parent
+
+STRUCTURE = (
+    StructureNode("S1", "sector 1", StructureNode("E1", "entry 1", checked=True), StructureNode("E2", ("a", 1))),
+    StructureNode("S2", "sector 2", NOT_LOADED),
+    StructureNode("S3", "sector 3", StructureNode("S4", "sector 4", StructureNode("E3", "entry 3")), opened=True),
+    StructureNode("E4", "entry 4"),
+)
+
+HANDOFF_SCRIPT = """
+import sys
+from v2.base.flatstruct import StructureHandoff
+from v2.base.server import TkBgServer
+from v2.base.structure import StructureNode
+from tests.popups import count_handoff
+
+if __name__ == "__main__":
+    handoff = StructureHandoff([StructureNode("E%i" % i, "entry %i" % i) for i in range(100)], "shm")
+    recv = TkBgServer(start_method=sys.argv[1])(count_handoff)(handoff)
+    print(recv.receive(True, timeout=60))
+    recv.close()
+    handoff.release()
+"""
+
+INSTAND_SCRIPT = """
+import os
+import time
+from multiprocessing import active_children
+from v2.base.structure import StructureNode
+from v2.treeselectpopup import popup
+
+if __name__ == "__main__":
+    before = set(os.listdir("/dev/shm"))
+    popup(*[StructureNode("E%i" % i, None) for i in range(100)], structure_handoff="shm", return_mode="instand value")
+    time.sleep(1)
+    for process in active_children():
+        process.terminate()
+    deadline = time.monotonic() + 10
+    while (left := set(os.listdir("/dev/shm")) - before) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    print(sorted(left))
+"""
+
+
+def test_flat_round_trip():
+    flat = FlatStructure(pack_structure(STRUCTURE))
+    assert flat.to_nodes() == STRUCTURE
+    assert [tuple(node) for node in flat.nodes()] == [tuple(node) for node in STRUCTURE]
+    flat.release()
+
+
+def test_from_nodes_children():
+    flat = FlatStructure.from_nodes(STRUCTURE)
+    assert [flat.nodes()[i][0] for i in range(len(STRUCTURE))] == ["S1", "S2", "S3", "E4"]
+    s3 = flat.nodes()[2]
+    assert s3.to_node() == STRUCTURE[2]
+    assert list(s3.child_iter()) == list(STRUCTURE[2].child_iter())
+    flat.release()
+
+
+@pytest.mark.parametrize("kind", ["shm", "mmap"])
+def test_handoff_pickled(kind):
+    handoff = StructureHandoff(STRUCTURE, kind)
+    other = loads(dumps(handoff))
+    assert other.open().to_nodes() == STRUCTURE
+    other.release()
+    handoff.release()
+    handoff.release()
+
+
+@pytest.mark.parametrize("method", ["fork", "spawn", "forkserver", "bootstrap"])
+def test_handoff_popup_no_leak(method):
+    if method != "spawn" and sys.platform == "win32":
+        pytest.skip("UNIX only")
+    run = subprocess.run(
+        (sys.executable, "-c", HANDOFF_SCRIPT, method),
+        cwd=ROOT, capture_output=True, text=True, timeout=120,
+    )
+    assert run.stdout.strip() == "100"
+    assert run.stderr == ""
+
+
+@pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="needs /dev/shm")
+def test_instand_value_no_leak():
+    run = subprocess.run(
+        (sys.executable, "-c", INSTAND_SCRIPT),
+        cwd=ROOT, capture_output=True, text=True, timeout=120,
+    )
+    assert run.stdout.strip() == "[]"
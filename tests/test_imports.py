@@ -0,0 +1,17 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).parent.parent
+
+
+@pytest.mark.parametrize("module", ["v2.treeselectpopup", "v2.base.broker", "v2.base.resultcodec", "v2.base.flatstruct"])
+def test_no_tkinter_in_main(module):
+    run = subprocess.run(
+        (sys.executable, "-c", "import sys, %s; print(sorted(m for m in sys.modules if 'tkinter' in m))" % module),
+        cwd=ROOT, capture_output=True, text=True, timeout=60,
+    )
+    assert run.returncode == 0, run.stderr
+    assert run.stdout.strip() == "[]"
@@ -0,0 +1,80 @@
+from pickle import dumps, loads
+from random import Random
+
+import pytest
+
+from v2.base.resultcodec import (
+    ResultIndex, pack_iids, unpack_iids, pack_check_bitmap, unpack_check_bitmap, encode_result, decode_result,
+    UNCHECKED, CHECKED, CSTATE,
+)
+from v2.base.structure import StructureNode
+
+STRUCTURE = (
+    StructureNode("S1", "sector 1", StructureNode("E1", "entry 1"), StructureNode("E2", ("a", 1))),
+    StructureNode("S2", "sector 2", StructureNode("S3", "sector 3", StructureNode("E3", "entry 3")), opened=True),
+    StructureNode("E4", "entry 4"),
+)
+
+
+@pytest.mark.parametrize("iids", [
+    [],
+    [""],
+    ["S1", "S1.E1", "S1.E2", "S2", "S2.S3", "S2.S3.E3", "E4"],
+    ["äöü", "äöü.ß", "日本", "日本.語"],
+    ["x" * 1000, "x" * 999 + "y", "x"],
+])
+def test_packed_iids(iids):
+    assert unpack_iids(pack_iids(iids)) == iids
+
+
+@pytest.mark.parametrize("format, fields", [
+    ("items", ()),
+    ("iids", ()),
+    ("packed", ()),
+    ("fields", ("iid", "values", "is_sector")),
+])
+def test_formats(format, fields):
+    index = ResultIndex(*STRUCTURE)
+    items = index.items(["S1", "S2.S3.E3", "E4"])
+    result = decode_result(loads(dumps(encode_result(items, format, fields))), format)
+    if format == "items":
+        assert result == [i.to_dict() for i in items]
+    elif format == "fields":
+        assert result == [("S1", "sector 1", True), ("S2.S3.E3", "entry 3", False), ("E4", "entry 4", False)]
+    else:
+        assert result == ["S1", "S2.S3.E3", "E4"]
+        assert index.items(result) == items
+    assert decode_result(encode_result(None, format, fields), format) is None
+
+
+def test_unknown_fields():
+    with pytest.raises(ValueError):
+        encode_result([], "fields", ("iid", "colour"))
+
+
+def test_index_items():
+    index = ResultIndex(*STRUCTURE)
+    sector = index.item("S2.S3")
+    assert sector.is_sector and sector.values == "sector 3"
+    entry = index.item("S1.E2")
+    assert not entry.is_sector and entry.values == ("a", 1)
+    index.add((StructureNode("E5", "entry 5"),), "S1")
+    assert index.item("S1.E5").values == "entry 5"
+
+
+@pytest.mark.parametrize("n", [0, 1, 3, 4, 5, 8, 1001])
+def test_check_bitmap(n):
+    states = bytes(Random(n).choice((UNCHECKED, CHECKED, CSTATE)) for _ in range(n))
+    assert unpack_check_bitmap(pack_check_bitmap(states)) == states
+    assert decode_result(encode_result(bytearray(states), "bitmap"), "bitmap") == states
+
+
+def test_checked_iids():
+    index = ResultIndex(*STRUCTURE)
+    assert index.preorder == ["S1", "S1.E1", "S1.E2", "S2", "S2.S3", "S2.S3.E3", "E4"]
+    assert index.sizes == [3, 1, 1, 3, 2, 1, 1]
+    # a checked sector stands for its subtree, a partly checked one is looked into
+    states = bytes((CHECKED, CHECKED, CHECKED, CSTATE, CSTATE, CHECKED, UNCHECKED))
+    assert index.checked_iids(states) == ["S1", "S2.S3.E3"]
+    assert index.checked_iids(bytes(len(states))) == []
+    assert index.checked_iids(None) is None
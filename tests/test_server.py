@@ -0,0 +1,173 @@
+import asyncio
+import sys
+
+import pytest
+
+from v2.base.server import TkBgServer, TkBgPool, AsyncTkBgReceiver, PopupHung, MSG_PATCH, as_completed, wait_any
+from v2.base.structure import StructureNode
+from tests.popups import reply, hang, progress, slow, events, collect, load
+
+
+def test_pool():
+    with TkBgPool(size=2) as pool:
+        receivers = [TkBgServer(pool=pool)(reply)(i, 0.01) for i in range(3)]
+        assert [recv.receive(True, timeout=60) for recv in receivers] == list(range(3))
+        for recv in receivers:
+            recv.close()
+
+
+def test_async_receive():
+    async def main():
+        receivers = [AsyncTkBgReceiver(TkBgServer()(reply)(i, 0.3 - i * 0.1)) for i in range(3)]
+        try:
+            with pytest.raises(asyncio.TimeoutError):
+                await receivers[0].receive(timeout=0.01)
+            return await asyncio.gather(*(recv.receive(timeout=60) for recv in receivers))
+        finally:
+            for recv in receivers:
+                recv.close()
+
+    assert asyncio.run(main()) == list(range(3))
+
+
+def test_metadata():
+    with TkBgPool(size=1) as pool:
+        for server, pooled in ((TkBgServer(), False), (TkBgServer(pool=pool), True)):
+            recv = server(reply)(0, 0.01)
+            recv.receive(True, timeout=60)
+            phases = recv.metadata["phases"]
+            assert ("warmed" in phases) is pooled
+            assert list(phases)[-2:] == ["result", "received"]
+            assert list(phases.values()) == sorted(phases.values())
+            recv.close()
+
+
+def test_progress():
+    recv = TkBgServer(heartbeat=0.05)(progress)(5)
+    steps = list()
+    recv.on_progress = steps.append
+    assert recv.receive(True, timeout=60) == 5
+    assert steps == list(range(5))
+    recv.close()
+
+
+@pytest.mark.parametrize("method", ["fork", "spawn", "forkserver", "bootstrap"])
+def test_hung(method):
+    if method != "spawn" and sys.platform == "win32":
+        pytest.skip("UNIX only")
+    recv = TkBgServer(start_method=method, heartbeat=0.1)(hang)()
+    with pytest.raises(PopupHung):
+        recv.receive(True, timeout=60)
+    recv.term_server()
+    recv.close()
+    recv = TkBgServer(start_method=method, heartbeat=0.1)(hang)()
+    assert next(as_completed((recv,), timeout=60)).hung
+    recv.term_server()
+    recv.close()
+
+
+def test_hung_at_startup():
+    recv = TkBgServer(heartbeat=0.1, hung_startup=0.2)(slow)(5)
+    with pytest.raises(PopupHung):
+        recv.receive(True, timeout=60)
+    recv.term_server()
+    recv.close()
+    recv = TkBgServer(heartbeat=0.1)(slow)(1)
+    assert recv.receive(True, timeout=60) == 1
+    recv.close()
+
+
+def test_hung_wait_value():
+    receivers = list()
+    server = TkBgServer(heartbeat=0.1, instand_return=True, receiver_setup=receivers.append)
+    with pytest.raises(PopupHung):
+        server(hang)()
+    receivers[0].process.join(10)
+    assert not receivers[0].process.is_alive()
+
+
+def test_iter_events():
+    recv = TkBgServer()(events)(5)
+    assert list(recv.iter_events(timeout=60)) == [("check", "E%i" % i, bool(i % 2)) for i in range(5)]
+    assert recv.receive(True, timeout=60) == 5
+    recv.close()
+
+
+def test_on_event():
+    recv = TkBgServer()(events)(5)
+    got = list()
+    recv.on_event = got.append
+    assert recv.receive(True, timeout=60) == 5
+    assert got == [("check", "E%i" % i, bool(i % 2)) for i in range(5)]
+    assert not recv.events
+    recv.close()
+
+
+@pytest.mark.parametrize("kind", ["tcp", "pipe"])
+def test_patch_dispatch(kind):
+    if kind == "pipe" and sys.platform == "win32":
+        pytest.skip("UNIX only")
+    patches = [
+        ("insert", "S1", (StructureNode("E9", "entry 9"),), 0),
+        ("delete", ("S1.E1",)),
+        ("move", "E4", "S1", "end"),
+        ("relabel", "S2", "sector two", None),
+    ]
+    recv = TkBgServer(transport=kind)(collect)(MSG_PATCH, len(patches))
+    for patch in patches:
+        recv.patch(*patch)
+    assert recv.receive(True, timeout=60) == patches
+    recv.close()
+
+
+def test_child_provider():
+    calls = list()
+    children = (StructureNode("C1", "child 1"), StructureNode("C2", "child 2"))
+
+    def provider(iid):
+        calls.append(iid)
+        if iid == "bad":
+            raise LookupError(iid)
+        return iter(children)
+
+    recv = TkBgServer()(load)(["S1", "bad", "S1"])
+    recv.child_provider = provider
+    # raised in the main process, the popup gets (iid, None)
+    with pytest.raises(LookupError):
+        recv.receive(True, timeout=60)
+    assert recv.receive(True, timeout=60) == [("S1", children), ("bad", None), ("S1", children)]
+    assert calls == ["S1", "bad"]
+    recv.close()
+
+
+def test_as_completed_order():
+    delays = (0.9, 0.1, 0.5)
+    receivers = [TkBgServer()(reply)(delay, delay) for delay in delays]
+    try:
+        assert [recv.receive() for recv in as_completed(receivers, timeout=60)] == sorted(delays)
+    finally:
+        for recv in receivers:
+            recv.close()
+
+
+def test_as_completed_timeout():
+    receivers = [TkBgServer()(reply)(i, 0.05 + i * 2) for i in range(2)]
+    try:
+        finished = list()
+        with pytest.raises(TimeoutError):
+            for recv in as_completed(receivers, timeout=1):
+                finished.append(recv.receive())
+        assert finished == [0]
+    finally:
+        for recv in receivers:
+            recv.close()
+
+
+def test_wait_any():
+    receivers = [TkBgServer()(reply)(i, 0.6 - i * 0.3) for i in range(2)]
+    try:
+        assert wait_any(receivers, timeout=0.01) is None
+        assert wait_any(receivers, timeout=60).receive() == 1
+    finally:
+        for recv in receivers:
+            recv.close()
@@ -0,0 +1,65 @@
+import sys
+from socket import socketpair
+
+import pytest
+
+from v2.base.server import TkBgServer
+from v2.base.transport import FrameReader, HEADER, send_frame
+from tests.popups import reply
+
+TRANSPORTS = ["tcp", "unix", "socketpair", "pipe"]
+START_METHODS = ["fork", "spawn", "forkserver", "bootstrap"]
+
+
+@pytest.mark.parametrize("method", START_METHODS)
+@pytest.mark.parametrize("kind", TRANSPORTS)
+def test_round_trip(kind, method):
+    if (kind in ("unix", "pipe") or method != "spawn") and sys.platform == "win32":
+        pytest.skip("UNIX only")
+    value = {"iids": ["E%i" % i for i in range(1000)], "blob": bytes(1 << 17)}
+    recv = TkBgServer(start_method=method, transport=kind)(reply)(value)
+    assert recv.receive(True, timeout=60) == value
+    recv.close()
+
+
+def test_frame_reader_partial():
+    a, b = socketpair()
+    b.setblocking(False)
+    reader = FrameReader()
+    payload = bytes(range(256)) * 4
+    frame = HEADER.pack(len(payload)) + payload
+    # header and payload both split across writes
+    for chunk in (frame[:3], frame[3:HEADER.size + 10], frame[HEADER.size + 10:-1]):
+        a.sendall(chunk)
+        assert reader.read(b) is None
+        assert reader.pending
+    a.sendall(frame[-1:])
+    assert reader.read(b) == payload
+    assert not reader.pending
+    assert reader.read(b) is None
+    a.close()
+    b.close()
+
+
+def test_frame_reader_stream():
+    a, b = socketpair()
+    reader = FrameReader()
+    payloads = [b"", b"x", bytes(1 << 16), bytes(1 << 20)]
+    for payload in payloads[:-1]:
+        send_frame(a, payload)
+    assert [reader.read(b) for _ in payloads[:-1]] == payloads[:-1]
+    a.setblocking(False)
+    b.setblocking(False)
+    # a large frame is taken in as far as it has arrived
+    sent = HEADER.pack(len(payloads[-1])) + payloads[-1]
+    view = memoryview(sent)
+    while view:
+        try:
+            view = view[a.send(view):]
+        except BlockingIOError:
+            assert reader.read(b) is None
+    assert reader.read(b) == payloads[-1]
+    a.close()
+    with pytest.raises(EOFError):
+        reader.read(b)
+    b.close()
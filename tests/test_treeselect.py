@@ -0,0 +1,253 @@
+import sys
+import time
+
+import pytest
+
+from v2.base.flatstruct import FlatStructure, pack_structure
+from v2.base.structure import StructureNode, TagsConfig, NOT_LOADED
+from v2.base.treeselect import SelectTree
+
+STRUCTURE = (
+    StructureNode("S1", None, StructureNode("E1", None), StructureNode("E2", ("a", 1))),
+    StructureNode("S2", "sector 2", StructureNode("E3", "entry 3"), opened=True),
+    StructureNode("E4", None),
+)
+
+IIDS = ("S1", "S1.E1", "S1.E2", "S2", "S2.E3", "E4")
+
+NESTED = tuple(
+    StructureNode(
+        "S%i" % s, "sector %i" % s,
+        StructureNode("T", "sub", *(StructureNode("E%i" % e, ("entry", e), checked=(s + e) % 3 == 0) for e in range(3))),
+        *(StructureNode("F%i" % e, None, checked=e == s % 2) for e in range(2)),
+        checked=s == 2,
+    )
+    for s in range(4)
+) + (StructureNode("E", "top entry", checked=True),)
+
+TOGGLES = ((True, "S0"), (False, "S0.T.E1"), (True, "S1.T"), (False, "S2"), (True, "E"), (True, "S3.F0"))
+
+
+class PerItemTree(SelectTree):
+    batch_insert = False
+
+
+def test_batch_insert_values(tk_root):
+    batched = SelectTree(*STRUCTURE, tags_config=TagsConfig(), master=tk_root)
+    per_item = PerItemTree(*STRUCTURE, tags_config=TagsConfig(), master=tk_root)
+    assert [batched.item(iid, "values") for iid in IIDS] == [per_item.item(iid, "values") for iid in IIDS]
+    assert batched.item("E4", "values") == ""
+    batched.destroy()
+    per_item.destroy()
+
+
+def test_check_events(tk_root):
+    tree = SelectTree(*STRUCTURE, tags_config=TagsConfig(), master=tk_root)
+    events = list()
+    tree.event_sink = events.append
+    tree.toggle_check(True, "S1.E1")
+    assert events == [("check", "S1.E1", True), ("check", "S1", None)]
+    events.clear()
+    tree.toggle_check(True, "S1.E2")
+    assert events == [("check", "S1.E2", True), ("check", "S1", True)]
+    events.clear()
+    tree.toggle_check(True, "S2")
+    assert events == [("check", "S2", True), ("check", "S2.E3", True)]
+    events.clear()
+    tree.toggle_check(True, "S2")
+    assert events == []
+    tree.destroy()
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_apply_patch(tk_root, lazy):
+    tree = SelectTree(*STRUCTURE, tags_config=TagsConfig(), master=tk_root, lazy=lazy)
+    tree.apply_patch(("insert", "S1", (StructureNode("E9", "entry 9"),), 0))
+    tree.apply_patch(("delete", ("S1.E1",)))
+    tree.apply_patch(("move", "E4", "S1", "end"))
+    tree.apply_patch(("relabel", "S2", "sector two", None))
+    assert tree.get_children("") == ("S1", "S2")
+    assert tree.get_children("S1") == ("S1.E9", "S1.E2", "E4")
+    assert tree.item("S1.E9", "text") == "E9"
+    assert tree.item("S2", "text") == "sector two"
+    assert not tree.exists("S1.E1")
+    assert tree.get_main_list("S1") == ["S1.E9", "S1.E2", "E4"]
+    tree.destroy()
+
+
+def test_load_children(tk_root):
+    tree = SelectTree(StructureNode("S3", None, NOT_LOADED, checked=True), tags_config=TagsConfig(), master=tk_root)
+    requested = list()
+    tree.children_loader = requested.append
+    tree._opened("S3")
+    tree._opened("S3")
+    assert requested == ["S3"]
+    # loading failed: still unloaded, requested again at the next opening
+    tree.load_children("S3", None)
+    assert tree.unloaded == {"S3"}
+    tree._opened("S3")
+    assert requested == ["S3", "S3"]
+    tree.load_children("S3", (StructureNode("C1", "child 1"), StructureNode("C2", "child 2")))
+    assert not tree.unloaded
+    assert tree.get_children("S3") == ("S3.C1", "S3.C2")
+    assert tree.get_checked_iids() == ["S3"]
+    assert tree.is_checked("S3.C2")
+    tree.destroy()
+
+
+def checks(tree):
+    return tree.check_states(), tree.get_checked_iids()
+
+
+def test_lazy_checks(tk_root):
+    eager = SelectTree(*NESTED, tags_config=TagsConfig(), master=tk_root)
+    lazy = SelectTree(*NESTED, tags_config=TagsConfig(), master=tk_root, lazy=True)
+    assert checks(lazy) == checks(eager)
+    for check, iid in TOGGLES:
+        eager.toggle_check(check, iid)
+        lazy.toggle_check(check, iid)
+        assert checks(lazy) == checks(eager), iid
+    eager.destroy()
+    lazy.destroy()
+
+
+def records(structure, path=()):
+    for node in structure:
+        yield path + (node[0],), node[1], node[2], node[4]
+        yield from records(node[3], path + (node[0],))
+
+
+def shape(tree, iid=""):
+    for child in tree.get_children(iid):
+        yield child, iid, tree.item(child, "text"), tree.item(child, "values"), tree.item(child, "tags")
+        yield from shape(tree, child)
+
+
+def test_records(tk_root):
+    eager = SelectTree(*NESTED, tags_config=TagsConfig(), master=tk_root)
+    streamed = SelectTree(tags_config=TagsConfig(), master=tk_root)
+    streamed.stream_chunk = 4
+    recs = list(records(NESTED))
+    streamed.add_records(recs[:7], last=False)
+    streamed.add_records(recs[7:])
+    deadline = time.monotonic() + 10
+    while not streamed.records_done or streamed.records_inserted < len(recs):
+        assert time.monotonic() < deadline
+        tk_root.update()
+    tk_root.update()
+    assert list(shape(streamed)) == list(shape(eager))
+    assert streamed.structure_preorder == eager.structure_preorder
+    assert checks(streamed) == checks(eager)
+    eager.destroy()
+    streamed.destroy()
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_flat_checks(tk_root, lazy):
+    eager = SelectTree(*NESTED, tags_config=TagsConfig(), master=tk_root, lazy=lazy)
+    flat = SelectTree(tags_config=TagsConfig(), master=tk_root, lazy=lazy, flat=FlatStructure(pack_structure(NESTED)))
+    assert list(shape(flat)) == list(shape(eager))
+    assert flat.structure_preorder == eager.structure_preorder
+    assert checks(flat) == checks(eager)
+    for check, iid in TOGGLES:
+        eager.toggle_check(check, iid)
+        flat.toggle_check(check, iid)
+        assert checks(flat) == checks(eager), iid
+    eager.destroy()
+    flat.destroy()
+
+
+def test_deep_tree(tk_root):
+    depth = sys.getrecursionlimit() + 100
+    node = StructureNode("E", "leaf")
+    for _ in range(depth):
+        node = StructureNode("D", None, node)
+    tree = SelectTree(node, tags_config=TagsConfig(), master=tk_root)
+    leaf = ".".join(("D",) * depth + ("E",))
+    assert tree.get_main_list("")[-1] == leaf
+    assert len(tree.get_main_list("")) == depth + 1
+    tree.toggle_check(True, leaf)
+    assert tree.get_checked_iids() == ["D"]
+    assert all(tree.check_states())
+    assert tree.search("E")
+    tree.remove_match_tags()
+    tree.toggle_check(False, "D")
+    assert not any(tree.check_states())
+    tree.delete_nodes(("D.D",))
+    assert tree.get_children("D") == ()
+    tree.destroy()
+
+
+@pytest.mark.parametrize("check", [True, False])
+def test_toggle_sector(tk_root, check):
+    tree = SelectTree(*NESTED, tags_config=TagsConfig(), master=tk_root)
+    tree.toggle_check(not check, "S1")
+    tree.toggle_check(check, "S1")
+    descendants = tree.get_main_list("S1")
+    assert len(descendants) == 6
+    for iid in descendants:
+        if tree.is_sector(iid):
+            tag = TagsConfig.c_check_sector if check else TagsConfig.c_uncheck_sector
+        else:
+            tag = TagsConfig.c_check_entry if check else TagsConfig.c_uncheck_entry
+        assert tag in tree.item(iid, "tags"), iid
+        assert tree.is_checked(iid) == check
+    tree.destroy()
+
+
+def assert_mirrors(tree):
+    for iid in tree.get_main_list(""):
+        if iid in tree._placeholders:
+            continue
+        assert set(tree.item(iid, "tags")) == set(tree._tags(iid)), iid
+        assert bool(tree.item(iid, "open")) == (iid in tree._open_items), iid
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_mirrors(tk_root, lazy):
+    tree = SelectTree(*NESTED, tags_config=TagsConfig(), master=tk_root, lazy=lazy)
+    assert_mirrors(tree)
+    for check, iid in TOGGLES:
+        tree.toggle_check(check, iid)
+        assert_mirrors(tree)
+    assert tree.search("E1")
+    assert_mirrors(tree)
+    tree.toggle_recursive_expand("S2", True)
+    assert_mirrors(tree)
+    tree.remove_match_tags()
+    tree.toggle_recursive_expand("", False)
+    assert_mirrors(tree)
+    tree.destroy()
+
+
+def assert_topology(tree):
+    stack = [""]
+    while stack:
+        iid = stack.pop()
+        children = tree.get_children(iid)
+        assert tuple(tree._children[iid]) == children, iid
+        for child in children:
+            assert tree._parent[child] == iid == tree.parent(child), child
+        stack += children
+    assert len(tree._parent) == len(tree._children) - 1
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_topology(tk_root, lazy):
+    tree = SelectTree(*NESTED, tags_config=TagsConfig(), master=tk_root, lazy=lazy)
+    assert_topology(tree)
+    tree.insert_nodes("S0.T", (StructureNode("N", None, StructureNode("E", None)),), 1)
+    assert_topology(tree)
+    tree.insert_nodes("", (StructureNode("N", None),), 0)
+    assert_topology(tree)
+    tree.move_node("S0.T", "S3", 0)
+    assert_topology(tree)
+    tree.move_node("E", "S0", "end")
+    assert_topology(tree)
+    tree.delete_nodes(("S1", "S0.T.N", "S2.F0"))
+    assert_topology(tree)
+    tree.delete_nodes(("S3",))
+    assert not tree.exists("S0.T")
+    assert_topology(tree)
+    assert tree.get_children("") == ("N", "S0", "S2")
+    tree.destroy()
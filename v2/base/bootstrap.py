@@ -0,0 +1,23 @@
+"""popup process of `TkBgServer(start_method="bootstrap")`: python -m v2.base.bootstrap <job fd>"""
+from importlib import import_module
+from sys import argv
+from pickle import load
+
+from .flatstruct import StructureHandoff
+from .server import _serve
+
+
+# the modules of every popup, nothing else
+for _name in ("popup", "treeselect"):
+    import_module("." + _name, __package__)
+
+
+def main(job_fd: int):
+    StructureHandoff.own_tracker = True
+    with open(job_fd, "rb") as job:
+        server, make, args, kwargs = load(job)
+    _serve(server, make, args, kwargs)
+
+
+if __name__ == '__main__':
+    main(int(argv[1]))
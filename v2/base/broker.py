@@ -0,0 +1,448 @@
+from __future__ import annotations
+
+from typing import Callable, Any, Literal, TYPE_CHECKING
+
+from atexit import register as _atexit_register, unregister as _atexit_unregister
+from collections import deque
+from concurrent.futures import Future
+from itertools import count
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import Connection
+from os import unlink, rmdir
+from os.path import join
+from pickle import dumps, loads
+from selectors import DefaultSelector, EVENT_READ
+from socket import socket, AF_INET, SOCK_STREAM, SOL_SOCKET, SO_REUSEADDR, SHUT_RDWR
+from tempfile import mkdtemp
+from threading import Thread, Lock
+
+from .server import TkBgServer, TkBgReceiver, TkBgPool, PopupHung, start_context, _PENDING
+from .transport import Transport, FrameReader, send_frame
+
+if TYPE_CHECKING:
+    from tkinter import Tk
+
+try:
+    # UNIX
+    from socket import AF_UNIX
+except ImportError:
+    # WIN
+    AF_UNIX = None
+
+
+# client -> broker
+REQ_POPUP = 0
+REQ_STATS = 1
+REQ_CANCEL = 2
+# broker -> client
+REP_RESULT = 0
+REP_REJECTED = 1
+REP_FAILED = 2
+REP_STATS = 3
+REP_META = 4
+REP_HUNG = 5
+
+_BACKLOG = 64
+
+
+class BrokerRejected(RuntimeError):
+    pass
+
+
+class _Client:
+
+    sock: socket
+    reader: FrameReader
+    requests: set[int]
+
+    def __init__(self, sock: socket):
+        self.sock = sock
+        self.reader = FrameReader()
+        self.requests = set()
+
+
+class _Broker:
+
+    def __init__(
+            self,
+            listener: socket,
+            parent: Connection,
+            concurrency: int,
+            queue_size: int,
+            pool: TkBgPool,
+            transport: Literal["tcp", "unix", "socketpair", "pipe"] | Callable[[], Transport],
+            heartbeat: float | None,
+    ):
+        self.listener = listener
+        self.parent = parent
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.pool = pool
+        self.transport = transport
+        self.heartbeat = heartbeat
+        self.selector = DefaultSelector()
+        self.queue: deque[tuple[_Client, int, Callable[..., Tk], tuple, dict]] = deque()
+        self.running: dict[tuple[_Client, int], TkBgReceiver] = dict()
+        self.clients: set[_Client] = set()
+        self.served = 0
+        self.rejected = 0
+        self.failed = 0
+        self.hung = 0
+        self._stop = False
+
+    def stats(self) -> dict[str, int]:
+        return dict(
+            queued=len(self.queue),
+            running=len(self.running),
+            concurrency=self.concurrency,
+            queue_size=self.queue_size,
+            clients=len(self.clients),
+            served=self.served,
+            rejected=self.rejected,
+            failed=self.failed,
+            hung=self.hung,
+        )
+
+    def reply(self, client: _Client, kind: int, obj: object):
+        try:
+            send_frame(client.sock, dumps((kind, obj)))
+        except OSError:
+            pass
+
+    def run(self):
+        self.listener.setblocking(False)
+        self.selector.register(self.listener, EVENT_READ, self.accept)
+        self.selector.register(self.parent, EVENT_READ, self.parent_gone)
+        while not self._stop:
+            for key, _ in self.selector.select(self.heartbeat):
+                key.data(key.fileobj)
+            if self.heartbeat:
+                self.reap_hung()
+        self.shutdown()
+
+    def reap_hung(self):
+        for (client, rid), recv in tuple(self.running.items()):
+            if recv.hung:
+                self.hung += 1
+                self.stop_popup(client, rid, terminate=True)
+                self.finish(client, rid, REP_HUNG, "popup hung (no heartbeat for %.1f seconds)" % recv.hung_after)
+
+    def parent_gone(self, parent: Connection):
+        self._stop = True
+
+    def accept(self, listener: socket):
+        try:
+            sock, _ = listener.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        client = _Client(sock)
+        self.clients.add(client)
+        self.selector.register(sock, EVENT_READ, lambda _: self.read_client(client))
+
+    def read_client(self, client: _Client):
+        try:
+            while (payload := client.reader.read(client.sock)) is not None:
+                try:
+                    kind, obj = loads(payload)
+                except Exception:
+                    self.drop_client(client)
+                    return
+                if kind == REQ_POPUP:
+                    # the job apart, so that a job that can't be loaded here fails alone
+                    rid, job = obj
+                    try:
+                        make, args, kwargs = loads(job)
+                    except Exception as e:
+                        self.finish(client, rid, REP_FAILED, "request not loadable: %r" % e)
+                        continue
+                    self.request(client, rid, make, args, kwargs)
+                elif kind == REQ_STATS:
+                    self.reply(client, REP_STATS, (obj, self.stats()))
+                elif kind == REQ_CANCEL:
+                    self.cancel(client, obj)
+        except (EOFError, OSError):
+            self.drop_client(client)
+
+    def drop_client(self, client: _Client):
+        self.selector.unregister(client.sock)
+        client.sock.close()
+        self.clients.discard(client)
+        for rid in tuple(client.requests):
+            self.cancel(client, rid)
+
+    def request(self, client: _Client, rid: int, make: Callable[..., Tk], args: tuple, kwargs: dict):
+        if len(self.running) < self.concurrency:
+            client.requests.add(rid)
+            self.launch(client, rid, make, args, kwargs)
+        elif len(self.queue) < self.queue_size:
+            client.requests.add(rid)
+            self.queue.append((client, rid, make, args, kwargs))
+        else:
+            self.rejected += 1
+            self.reply(client, REP_REJECTED, (rid, "queue full (%i queued, %i running)" % (len(self.queue), len(self.running))))
+
+    def launch(self, client: _Client, rid: int, make: Callable[..., Tk], args: tuple, kwargs: dict):
+        try:
+            recv = TkBgServer(transport=self.transport, pool=self.pool, heartbeat=self.heartbeat)(make)(*args, **kwargs)
+        except Exception as e:
+            self.finish(client, rid, REP_FAILED, "popup not started: %r" % e)
+            return
+        recv.sock.setblocking(False)
+        self.running[client, rid] = recv
+        self.selector.register(recv.sock, EVENT_READ, lambda _: self.read_popup(client, rid))
+
+    def read_popup(self, client: _Client, rid: int):
+        recv = self.running.get((client, rid))
+        if recv is None:
+            return
+        try:
+            result = recv._feed()
+        except (EOFError, OSError):
+            self.stop_popup(client, rid)
+            self.finish(client, rid, REP_FAILED, "popup process exited without a result")
+            return
+        if result is not _PENDING:
+            self.stop_popup(client, rid)
+            self.served += 1
+            if recv.metadata is not None and client in self.clients:
+                self.reply(client, REP_META, (rid, recv.metadata))
+            self.finish(client, rid, REP_RESULT, result)
+
+    def stop_popup(self, client: _Client, rid: int, terminate: bool = False):
+        recv = self.running.pop((client, rid))
+        self.selector.unregister(recv.sock)
+        if terminate:
+            recv.term_server()
+        else:
+            recv.close()
+
+    def finish(self, client: _Client, rid: int, kind: int, obj: object):
+        client.requests.discard(rid)
+        if kind == REP_FAILED or kind == REP_HUNG:
+            self.failed += 1
+        if client in self.clients:
+            self.reply(client, kind, (rid, obj))
+        self.start_queued()
+
+    def cancel(self, client: _Client, rid: int):
+        client.requests.discard(rid)
+        if (client, rid) in self.running:
+            self.stop_popup(client, rid, terminate=True)
+            self.start_queued()
+        else:
+            for job in self.queue:
+                if job[0] is client and job[1] == rid:
+                    self.queue.remove(job)
+                    break
+
+    def start_queued(self):
+        while self.queue and len(self.running) < self.concurrency:
+            self.launch(*self.queue.popleft())
+
+    def shutdown(self):
+        for client, rid in tuple(self.running):
+            self.stop_popup(client, rid, terminate=True)
+        for client in tuple(self.clients):
+            client.sock.close()
+        self.listener.close()
+        self.pool.close()
+
+
+def _broker_main(
+        listener: socket,
+        parent: Connection,
+        concurrency: int,
+        queue_size: int,
+        pool_size: int,
+        warmup: Callable[[], Any] | None,
+        transport: Literal["tcp", "unix", "socketpair", "pipe"] | Callable[[], Transport],
+        heartbeat: float | None,
+):
+    pool = TkBgPool(pool_size, warmup)
+    _Broker(listener, parent, concurrency, queue_size, pool, transport, heartbeat).run()
+
+
+class TkBgBroker:
+    """
+    Process serving the popup requests of many clients: `concurrency` popups at a time,
+    `queue_size` waiting, the rest `BrokerRejected`. `make`, its arguments, `warmup` and `transport` are pickled.
+    """
+
+    address: tuple[str, int] | str
+    concurrency: int
+    queue_size: int
+    heartbeat: float | None
+    process: Process | None
+
+    def __init__(
+            self,
+            address: str = "127.0.0.1",
+            port: int = 0,
+            concurrency: int = 4,
+            queue_size: int = 16,
+            pool_size: int = 0,
+            warmup: Callable[[], Any] | None = None,
+            unix: bool = False,
+            transport: Literal["tcp", "unix", "socketpair", "pipe"] | Callable[[], Transport] = "socketpair",
+            heartbeat: float | None = None,
+    ):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.pool_size = pool_size
+        self.warmup = warmup
+        self.transport = transport
+        self.heartbeat = heartbeat
+        self._dir = None
+        if unix:
+            if AF_UNIX is None:
+                raise OSError("AF_UNIX is not available on this platform")
+            self._dir = mkdtemp(prefix="tkbg-broker-")
+            self._listener = socket(AF_UNIX, SOCK_STREAM)
+            self._listener.bind(join(self._dir, "sock"))
+        else:
+            self._listener = socket(AF_INET, SOCK_STREAM)
+            self._listener.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+            self._listener.bind((address, port))
+        self._listener.listen(_BACKLOG)
+        self.address = self._listener.getsockname()
+        self.process = None
+        self._parent = None
+
+    def start(self) -> TkBgBroker:
+        broker_end, self._parent = Pipe(duplex=False)
+        # not daemonic, it starts the popups itself
+        self.process = start_context("spawn").Process(
+            target=_broker_main,
+            args=(self._listener, broker_end, self.concurrency, self.queue_size,
+                  self.pool_size, self.warmup, self.transport, self.heartbeat),
+            daemon=False,
+        )
+        self.process.start()
+        broker_end.close()
+        self._listener.close()
+        _atexit_register(self.stop)
+        return self
+
+    def client(self) -> TkBgBrokerClient:
+        return TkBgBrokerClient(self.address)
+
+    def stop(self, timeout: float | None = 5):
+        _atexit_unregister(self.stop)
+        if self._parent is not None:
+            self._parent.close()
+            self._parent = None
+        if self.process is not None:
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+        if self._dir:
+            try:
+                unlink(self.address)
+                rmdir(self._dir)
+            except OSError:
+                pass
+            self._dir = None
+
+    def __enter__(self) -> TkBgBroker:
+        if self.process is None:
+            self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+class TkBgBrokerClient:
+    """thread-safe connection to a `TkBgBroker`; cancelling a `submit` future terminates the popup"""
+
+    address: tuple[str, int] | str
+    sock: socket
+
+    def __init__(self, address: tuple[str, int] | str):
+        self.address = address
+        self.sock = socket(AF_UNIX if isinstance(address, str) else AF_INET, SOCK_STREAM)
+        self.sock.connect(address)
+        self._ids = count()
+        self._futures: dict[int, Future] = dict()
+        self._lock = Lock()
+        self._reader = Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _send(self, kind: int, obj: object):
+        payload = dumps((kind, obj))
+        with self._lock:
+            send_frame(self.sock, payload)
+
+    def _request(self, kind: int, obj: Callable[[int], object]) -> tuple[int, Future]:
+        rid = next(self._ids)
+        future = Future()
+        with self._lock:
+            self._futures[rid] = future
+        self._send(kind, obj(rid))
+        return rid, future
+
+    def _read(self):
+        reader = FrameReader()
+        try:
+            while True:
+                kind, (rid, obj) = loads(reader.read(self.sock))
+                if kind == REP_META:
+                    with self._lock:
+                        future = self._futures.get(rid)
+                    if future is not None:
+                        future.metadata = obj
+                    continue
+                with self._lock:
+                    future = self._futures.pop(rid, None)
+                if future is None or future.done():
+                    continue
+                if kind == REP_REJECTED:
+                    future.set_exception(BrokerRejected(obj))
+                elif kind == REP_FAILED:
+                    future.set_exception(EOFError(obj))
+                elif kind == REP_HUNG:
+                    future.set_exception(PopupHung(obj))
+                else:
+                    future.set_result(obj)
+        except (EOFError, OSError):
+            pass
+        with self._lock:
+            futures, self._futures = self._futures, dict()
+        for future in futures.values():
+            if not future.done():
+                future.set_exception(EOFError("connection to the broker closed"))
+
+    def submit(self, make: Callable[..., Tk], *args, **kwargs) -> Future:
+        job = dumps((make, args, kwargs))
+        rid, future = self._request(REQ_POPUP, lambda rid: (rid, job))
+
+        def cancelled(f: Future):
+            if f.cancelled():
+                with self._lock:
+                    self._futures.pop(rid, None)
+                try:
+                    self._send(REQ_CANCEL, rid)
+                except OSError:
+                    pass
+
+        future.add_done_callback(cancelled)
+        return future
+
+    def stats(self, timeout: float | None = None) -> dict[str, int]:
+        return self._request(REQ_STATS, lambda rid: rid)[1].result(timeout)
+
+    def close(self):
+        try:
+            self.sock.shutdown(SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        self._reader.join()
+
+    def __enter__(self) -> TkBgBrokerClient:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,403 @@
+from __future__ import annotations
+
+from typing import Iterable, Iterator, Literal, Any
+
+from array import array
+from mmap import mmap, ACCESS_READ
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from os import unlink, getpid, close as _close, write as _write
+from pickle import dumps, loads
+from struct import Struct
+from sys import byteorder
+from tempfile import mkstemp
+
+from .structure import StructureNode, NOT_LOADED, _NotLoaded
+
+# buffer:
+#   header
+#   parent  int32[n]        preorder index of the parent node, -1 at top level
+#   first   int32[n]        preorder index of the first child, -1 without children
+#   next    int32[n]        preorder index of the next sibling, -1 for the last child
+#   flags   uint8[n]        padded to 4 bytes
+#   offsets uint32[3n + 1]  (iid, label, values) slots of node i at 3i .. 3i + 2 in data
+#   data                    utf-8 text, pickled values if not a str
+HEADER = Struct("<4sBBxxII")
+MAGIC = b"TKFS"
+VERSION = 2
+
+F_CHECKED = 1
+F_OPENED = 2
+F_SECTOR = 4
+F_NOT_LOADED = 8
+F_IID_IS_LABEL = 16
+F_VALUES_PICKLED = 32
+
+_LITTLE = byteorder == "little"
+
+
+def pack_structure(structure: Iterable[StructureNode]) -> bytes:
+    """the nested `structure` as one flat buffer (preorder columns)"""
+    parent = array("i")
+    first = array("i")
+    after = array("i")
+    flags = bytearray()
+    offsets = array("I", (0,))
+    data = list()
+    size = 0
+
+    stack = [[-1, iter(structure), -1]]
+    while stack:
+        frame = stack[-1]
+        p, it, last = frame
+        node = next(it, None)
+        if node is None:
+            stack.pop()
+            continue
+        iid, label, values, children, checked, opened = node
+        f = F_CHECKED * bool(checked) | F_OPENED * bool(opened)
+        if iid == label:
+            f |= F_IID_IS_LABEL
+            iid = b""
+        else:
+            iid = iid.encode()
+        if isinstance(values, str):
+            values = values.encode()
+        else:
+            f |= F_VALUES_PICKLED
+            values = dumps(values)
+        for b in (iid, label.encode(), values):
+            data.append(b)
+            size += len(b)
+            offsets.append(size)
+        i = len(parent)
+        parent.append(p)
+        first.append(-1)
+        after.append(-1)
+        if last >= 0:
+            after[last] = i
+        elif p >= 0:
+            first[p] = i
+        frame[2] = i
+        if children:
+            f |= F_SECTOR
+            if children == (NOT_LOADED,):
+                f |= F_NOT_LOADED
+            else:
+                stack.append([i, iter(children), -1])
+        flags.append(f)
+
+    if size >= 1 << 32:
+        raise ValueError("structure text exceeds 4 GiB")
+    if not _LITTLE:
+        for column in (parent, first, after, offsets):
+            column.byteswap()
+    n = len(parent)
+    flags += bytes(-n % 4)
+    return b"".join((
+        HEADER.pack(MAGIC, VERSION, byteorder == "little", n, size),
+        parent.tobytes(), first.tobytes(), after.tobytes(), flags, offsets.tobytes(), *data
+    ))
+
+
+class FlatStructure:
+    """read-only view of a `pack_structure` buffer, nothing is copied"""
+
+    n: int
+    parent: memoryview
+    first_child: memoryview
+    next_sibling: memoryview
+    flags: memoryview
+    offsets: memoryview
+    data: memoryview
+
+    def __init__(self, buffer):
+        buffer = memoryview(buffer).cast("B")
+        magic, version, little, n, size = HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a flat structure buffer")
+        if little != _LITTLE:
+            raise ValueError("flat structure buffer of a different byte order")
+        self.n = n
+        pos = HEADER.size
+        self.parent = buffer[pos:pos + 4 * n].cast("i")
+        pos += 4 * n
+        self.first_child = buffer[pos:pos + 4 * n].cast("i")
+        pos += 4 * n
+        self.next_sibling = buffer[pos:pos + 4 * n].cast("i")
+        pos += 4 * n
+        self.flags = buffer[pos:pos + n]
+        pos += n + (-n % 4)
+        self.offsets = buffer[pos:pos + 4 * (3 * n + 1)].cast("I")
+        pos += 4 * (3 * n + 1)
+        self.data = buffer[pos:pos + size]
+        self._buffer = buffer
+
+    @classmethod
+    def from_nodes(cls, structure: Iterable[StructureNode]) -> FlatStructure:
+        return cls(pack_structure(structure))
+
+    def __len__(self) -> int:
+        return self.n
+
+    def _slot(self, i: int) -> memoryview:
+        return self.data[self.offsets[i]:self.offsets[i + 1]]
+
+    def label(self, i: int) -> str:
+        return str(self._slot(3 * i + 1), "utf-8")
+
+    def iid(self, i: int) -> str:
+        if self.flags[i] & F_IID_IS_LABEL:
+            return self.label(i)
+        return str(self._slot(3 * i), "utf-8")
+
+    def values(self, i: int) -> Any:
+        if self.flags[i] & F_VALUES_PICKLED:
+            return loads(self._slot(3 * i + 2))
+        return str(self._slot(3 * i + 2), "utf-8")
+
+    def rows(self) -> Iterator[tuple[int, str, str, Any, int]]:
+        """(parent index, iid, label, values, flags) in preorder"""
+        # decoding slices of bytes is much faster than of memoryviews
+        data = self.data.tobytes()
+        offsets = self.offsets.tolist()
+        flags = self.flags.tobytes()
+        for i, p in enumerate(self.parent.tolist()):
+            f = flags[i]
+            o = 3 * i
+            label = data[offsets[o + 1]:offsets[o + 2]].decode()
+            iid = label if f & F_IID_IS_LABEL else data[offsets[o]:offsets[o + 1]].decode()
+            values = data[offsets[o + 2]:offsets[o + 3]]
+            values = loads(values) if f & F_VALUES_PICKLED else values.decode()
+            yield p, iid, label, values, f
+
+    def children(self, i: int) -> tuple[FlatNode, ...] | tuple[_NotLoaded]:
+        if self.flags[i] & F_NOT_LOADED:
+            return NOT_LOADED,
+        children = list()
+        i = self.first_child[i]
+        while i >= 0:
+            children.append(FlatNode(self, i))
+            i = self.next_sibling[i]
+        return tuple(children)
+
+    def nodes(self) -> tuple[FlatNode, ...]:
+        nodes = list()
+        i = 0 if self.n else -1
+        while i >= 0:
+            nodes.append(FlatNode(self, i))
+            i = self.next_sibling[i]
+        return tuple(nodes)
+
+    def subtree_end(self, i: int) -> int:
+        while i >= 0 and self.next_sibling[i] < 0:
+            i = self.parent[i]
+        return self.next_sibling[i] if i >= 0 else self.n
+
+    def to_nodes(self, i: int | None = None) -> tuple[StructureNode, ...]:
+        if i is None:
+            start, end = 0, self.n
+            rows = list(self.rows())
+        else:
+            start, end = i, self.subtree_end(i)
+            rows = [(self.parent[j], self.iid(j), self.label(j), self.values(j), self.flags[j]) for j in range(start, end)]
+        children = [list() for _ in range(end - start)]
+        top = list()
+        for j in range(end - 1, start - 1, -1):
+            p, iid, label, values, f = rows[j - start]
+            if f & F_NOT_LOADED:
+                c = (NOT_LOADED,)
+            else:
+                c = reversed(children[j - start])
+            node = StructureNode(label, values, *c, iid=iid, checked=bool(f & F_CHECKED), opened=bool(f & F_OPENED))
+            (children[p - start] if p >= start else top).append(node)
+        return tuple(reversed(top))
+
+    def release(self):
+        for view in (self.parent, self.first_child, self.next_sibling, self.flags, self.offsets, self.data, self._buffer):
+            view.release()
+
+
+class FlatNode:
+    """node `i` of a `FlatStructure`, reads and pickles like a `StructureNode`"""
+
+    __slots__ = ("flat", "i")
+
+    def __init__(self, flat: FlatStructure, i: int):
+        self.flat = flat
+        self.i = i
+
+    def __len__(self) -> int:
+        return 6
+
+    def __getitem__(self, k: int | slice) -> Any:
+        if isinstance(k, slice):
+            return tuple(self)[k]
+        if k < 0:
+            k += 6
+        flat, i = self.flat, self.i
+        if k == 0:
+            return flat.iid(i)
+        if k == 1:
+            return flat.label(i)
+        if k == 2:
+            return flat.values(i)
+        if k == 3:
+            return flat.children(i)
+        if k == 4:
+            return bool(flat.flags[i] & F_CHECKED)
+        if k == 5:
+            return bool(flat.flags[i] & F_OPENED)
+        raise IndexError(k)
+
+    def __iter__(self) -> Iterator[Any]:
+        return (self[k] for k in range(6))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (tuple, FlatNode)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(tuple(self))
+
+    def __repr__(self) -> str:
+        return repr(tuple(self))
+
+    def __reduce_ex__(self, protocol):
+        return self.to_node().__reduce_ex__(protocol)
+
+    @property
+    def has_child(self) -> bool:
+        return bool(self.flat.flags[self.i] & F_SECTOR)
+
+    @property
+    def loaded(self) -> bool:
+        return not self.flat.flags[self.i] & F_NOT_LOADED
+
+    def child_iter(self) -> Iterator[str]:
+        flat = self.flat
+        return (flat.iid(j) for j in range(self.i, flat.subtree_end(self.i)))
+
+    def to_node(self) -> StructureNode:
+        return self.flat.to_nodes(self.i)[0]
+
+
+class StructureHandoff:
+    """a packed structure in shared memory or a temporary file, pickled to the popup instead of the nodes"""
+
+    kind: Literal["shm", "mmap"]
+    name: str
+    size: int
+    # set by `bootstrap`, whose popups have a resource tracker of their own
+    own_tracker: bool = False
+
+    def __init__(self, structure: Iterable[StructureNode], kind: Literal["shm", "mmap"] = "shm"):
+        buffer = pack_structure(structure)
+        self.kind = kind
+        self.size = len(buffer)
+        self._shm = None
+        self._map = None
+        self._flat = None
+        self._owner = getpid()
+        if kind == "shm":
+            self._shm = SharedMemory(create=True, size=self.size)
+            self._shm.buf[:self.size] = buffer
+            self.name = self._shm.name
+        elif kind == "mmap":
+            fd, self.name = mkstemp(prefix="tkbg-", suffix=".tkfs")
+            try:
+                view = memoryview(buffer)
+                while view:
+                    view = view[_write(fd, view):]
+            finally:
+                _close(fd)
+        else:
+            raise ValueError(kind)
+
+    def __getstate__(self) -> dict:
+        return dict(kind=self.kind, name=self.name, size=self.size, _shm=None, _map=None, _flat=None, _owner=None)
+
+    def open(self) -> FlatStructure:
+        if self.kind == "shm":
+            if self._shm is None:
+                self._shm = SharedMemory(self.name)
+                if self.own_tracker:
+                    resource_tracker.unregister(self._shm._name, "shared_memory")
+            self._flat = FlatStructure(self._shm.buf[:self.size])
+        else:
+            with open(self.name, "rb") as f:
+                self._map = mmap(f.fileno(), 0, access=ACCESS_READ)
+            self._flat = FlatStructure(self._map)
+        return self._flat
+
+    def release(self):
+        if self._flat is not None:
+            self._flat.release()
+            self._flat = None
+        if self.kind == "shm":
+            if self._shm is None:
+                return
+            self._shm.close()
+            if self._owner == getpid():
+                try:
+                    self._shm.unlink()
+                except FileNotFoundError:
+                    resource_tracker.unregister(self._shm._name, "shared_memory")
+            self._shm = None
+            return
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        try:
+            unlink(self.name)
+        except FileNotFoundError:
+            pass
+
+
+if __name__ == '__main__':
+    # python -m v2.base.flatstruct [sectors] [entries per sector]
+    from sys import argv
+    from time import perf_counter
+    from tracemalloc import start, stop, get_traced_memory
+
+    sectors = int(argv[1]) if len(argv) > 1 else 2_000
+    entries = int(argv[2]) if len(argv) > 2 else 50
+
+    def make_structure():
+        return tuple(
+            StructureNode("S%i" % s, "sector %i" % s, *(StructureNode("E%i" % e, "entry %i-%i" % (s, e)) for e in range(entries)))
+            for s in range(sectors)
+        )
+
+    nodes = sectors * (entries + 1)
+    start()
+    structure = make_structure()
+    nested_bytes = get_traced_memory()[0]
+    flat = FlatStructure.from_nodes(structure)
+    flat_bytes = get_traced_memory()[0] - nested_bytes
+    stop()
+    print("%-26s %9.1f bytes / node" % ("nested StructureNode", nested_bytes / nodes))
+    print("%-26s %9.1f bytes / node" % ("FlatStructure", flat_bytes / nodes))
+    flat.release()
+
+    def timed(f, *args):
+        t = perf_counter()
+        r = f(*args)
+        return perf_counter() - t, r
+
+    t_dump, data = timed(dumps, structure)
+    t_load, _ = timed(loads, data)
+    print("%-26s %9.1f ms  %10i bytes" % ("pickle dumps / loads", (t_dump + t_load) * 1e3, len(data)))
+    t_pack, buffer = timed(pack_structure, structure)
+    print("%-26s %9.1f ms  %10i bytes" % ("pack (main, once)", t_pack * 1e3, len(buffer)))
+    for kind in ("shm", "mmap"):
+        t_hand, handoff = timed(StructureHandoff, structure, kind)
+        t_pick, h = timed(lambda: loads(dumps(handoff)))
+        t_open, flat = timed(h.open)
+        t_rows, _ = timed(lambda: sum(1 for _ in flat.rows()))
+        h.release()
+        handoff.release()
+        print("%-26s %9.1f ms  (handoff %.1f, open %.2f, read rows %.1f)" % (
+            kind + " handoff + rows", (t_hand + t_pick + t_open + t_rows) * 1e3,
+            t_hand * 1e3, t_open * 1e3, t_rows * 1e3))
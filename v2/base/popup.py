@@ -18,12 +18,19 @@ class PopupRoot(Tk):
         Tk.__init__(self)
         self.resizable(False, False)
 
-        self.window_mode = window_mode
-        self.title_label = title
-
         self.fullscreen_height = int(self.winfo_screenheight() * 0.0756)
         self.fullscreen_width = int(self.winfo_screenwidth() * 0.062)
 
+        self.setup(window_mode, title)
+
+    def setup(
+            self,
+            window_mode: Literal["dead", "headless", "fullscreen", "top"] = False,
+            title: str = "Column Select",
+    ):
+        self.window_mode = window_mode
+        self.title_label = title
+
         if window_mode:
             _drag = True
             if window_mode == "dead":
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+from typing import Iterable, Literal, Sequence
+
+from array import array
+from struct import Struct
+from sys import byteorder
+from zlib import compress, decompress
+
+from .structure import StructureNode, ThreeItem, TagsConfig, NOT_LOADED
+
+#   "items"   [ThreeItem.to_dict(), ...]
+#   "iids"    [iid, ...]
+#   "fields"  [(field, ...), ...] of the ThreeItem fields in `fields`
+#   "packed"  front coded iids
+#   "bitmap"  check states of the whole structure in preorder
+ResultFormat = Literal["items", "iids", "fields", "packed", "bitmap"]
+
+FIELDS = ("iid", "text", "image", "values", "open", "tags", "is_sector")
+
+_PACKED_HEADER = Struct("<I")
+
+UNCHECKED = 0
+CHECKED = 1
+CSTATE = 2
+
+# 2 bit states, 4 per byte, first node in the low bits
+_UNPACK_TABLE = tuple(bytes((b & 3, b >> 2 & 3, b >> 4 & 3, b >> 6)) for b in range(256))
+
+_LITTLE = byteorder == "little"
+
+
+def pack_iids(iids: Sequence[str]) -> bytes:
+    """`<n: uint32><shared prefix lengths: uint32[n]>` (little-endian) `<NUL separated suffixes: utf-8>`"""
+    prefixes = array("I")
+    suffixes = list()
+    prev = ""
+    for iid in iids:
+        # longest common prefix by bisection
+        n, hi = 0, min(len(prev), len(iid))
+        while n < hi:
+            mid = (n + hi + 1) // 2
+            if prev[:mid] == iid[:mid]:
+                n = mid
+            else:
+                hi = mid - 1
+        prefixes.append(n)
+        suffixes.append(iid[n:])
+        prev = iid
+    if not _LITTLE:
+        prefixes.byteswap()
+    return _PACKED_HEADER.pack(len(prefixes)) + prefixes.tobytes() + "\0".join(suffixes).encode()
+
+
+def unpack_iids(data: bytes) -> list[str]:
+    n = _PACKED_HEADER.unpack_from(data)[0]
+    end = _PACKED_HEADER.size + 4 * n
+    prefixes = array("I", data[_PACKED_HEADER.size:end])
+    if not _LITTLE:
+        prefixes.byteswap()
+    iids = list()
+    if not n:
+        return iids
+    prev = ""
+    for p, suffix in zip(prefixes, data[end:].decode().split("\0")):
+        prev = prev[:p] + suffix
+        iids.append(prev)
+    return iids
+
+
+def pack_check_bitmap(states: bytes | bytearray) -> bytes:
+    """`<n: uint32>` (little-endian) `<zlib compressed 2 bit states, 4 per byte>`"""
+    n = len(states)
+    states = bytes(states) + bytes(-n % 4)
+    packed = bytes(a | b << 2 | c << 4 | d << 6 for a, b, c, d in zip(states[0::4], states[1::4], states[2::4], states[3::4]))
+    return _PACKED_HEADER.pack(n) + compress(packed, 9)
+
+
+def unpack_check_bitmap(data: bytes) -> bytes:
+    n = _PACKED_HEADER.unpack_from(data)[0]
+    return b"".join(map(_UNPACK_TABLE.__getitem__, decompress(data[_PACKED_HEADER.size:])))[:n]
+
+
+def encode_result(
+        items: list[ThreeItem] | None,
+        format: ResultFormat = "items",
+        fields: Sequence[str] = ("iid",),
+) -> object:
+    """`items` as `SelectTree.get_checked`, the `SelectTree.check_states` for bitmap"""
+    if items is None:
+        return None
+    if format == "bitmap":
+        return pack_check_bitmap(items)
+    if format == "items":
+        return [i.to_dict() for i in items]
+    if format == "iids":
+        return [str(i) for i in items]
+    if format == "packed":
+        return pack_iids(items)
+    if format == "fields":
+        if unknown := set(fields) - set(FIELDS):
+            raise ValueError("unknown result fields: %s" % ", ".join(sorted(unknown)))
+        get = [(lambda i: str(i)) if f == "iid" else (lambda i, f=f: getattr(i, f)) for f in fields]
+        return [tuple(g(i) for g in get) for i in items]
+    raise ValueError(format)
+
+
+def decode_result(obj: object, format: ResultFormat = "items") -> object:
+    if obj is None or format not in ("packed", "bitmap"):
+        return obj
+    if format == "bitmap":
+        return unpack_check_bitmap(obj)
+    return unpack_iids(obj)
+
+
+class ResultIndex:
+    """rebuilds the `ThreeItem`s of result iids from the structure of the main process"""
+
+    iid_sep: str
+    preorder: list[str]
+    sizes: list[int]
+
+    def __init__(self, *structure: StructureNode, iid_sep: str = "."):
+        self.iid_sep = iid_sep
+        self._nodes: dict[str, tuple[StructureNode, bool]] = dict()
+        self.preorder = list()
+        self.sizes = list()
+        self.add(structure)
+
+    def add(self, structure: Iterable[StructureNode], parent: str = ""):
+        nodes = self._nodes
+        iid_sep = self.iid_sep
+        preorder = self.preorder
+        sizes = self.sizes
+        stack = [(parent, iter(structure), -1)]
+        while stack:
+            p, it, pi = stack[-1]
+            node = next(it, None)
+            if node is None:
+                stack.pop()
+                if pi >= 0:
+                    sizes[pi] = len(preorder) - pi
+                continue
+            iid = p + iid_sep + node[0] if p else node[0]
+            nodes[iid] = (node, not p)
+            i = len(preorder)
+            preorder.append(iid)
+            sizes.append(1)
+            if node[3] and node[3] != (NOT_LOADED,):
+                stack.append((iid, iter(node[3]), i))
+
+    def checked_iids(self, states: bytes | None) -> list[str] | None:
+        if states is None:
+            return None
+        preorder = self.preorder
+        sizes = self.sizes
+        checked = list()
+        i = 0
+        n = len(states)
+        while i < n:
+            state = states[i]
+            if state == CSTATE:
+                i += 1
+                continue
+            if state == CHECKED:
+                checked.append(preorder[i])
+            i += sizes[i]
+        return checked
+
+    def node(self, iid: str) -> StructureNode:
+        return self._nodes[iid][0]
+
+    def item(self, iid: str, checked: bool = True) -> ThreeItem:
+        node, top = self._nodes[iid]
+        if node[3]:
+            tags = [TagsConfig.t_sector, TagsConfig.t_top_sector if top else TagsConfig.t_sub_sector,
+                    TagsConfig.c_check_sector if checked else TagsConfig.c_uncheck_sector]
+        else:
+            tags = [TagsConfig.t_entry, TagsConfig.c_check_entry if checked else TagsConfig.c_uncheck_entry]
+        return ThreeItem(iid, node[1], "", node[2], node[5], tags, bool(node[3]))
+
+    def items(self, iids: Iterable[str] | None) -> list[ThreeItem] | None:
+        if iids is None:
+            return None
+        return [self.item(iid) for iid in iids]
+
+
+if __name__ == '__main__':
+    # python -m v2.base.resultcodec [sectors] [entries per sector]
+    from pickle import dumps, loads
+    from sys import argv
+    from time import perf_counter
+
+    sectors = int(argv[1]) if len(argv) > 1 else 200
+    entries = int(argv[2]) if len(argv) > 2 else 100
+    structure = tuple(
+        StructureNode("Sector %i" % s, "sector %i" % s, *(StructureNode("Entry %i" % e, ("entry", s, e)) for e in range(entries)))
+        for s in range(sectors)
+    )
+    index = ResultIndex(*structure)
+    position = {iid: i for i, iid in enumerate(index.preorder)}
+    checked = list()
+    states = bytearray(len(index.preorder))
+    for s in range(0, sectors, 2):
+        sector = "Sector %i" % s
+        if s % 4:
+            checked.append(index.item(sector))
+            states[position[sector]:position[sector] + index.sizes[position[sector]]] = bytes((CHECKED,)) * (entries + 1)
+        else:
+            states[position[sector]] = CSTATE
+            for e in range(1, entries):
+                iid = "%s.Entry %i" % (sector, e)
+                checked.append(index.item(iid))
+                states[position[iid]] = CHECKED
+
+    def timed(f, *args):
+        t = perf_counter()
+        for _ in range(5):
+            r = f(*args)
+        return (perf_counter() - t) / 5, r
+
+    print("%i checked items" % len(checked))
+    print("%-8s %12s %12s %12s %14s" % ("format", "bytes", "encode ms", "decode ms", "rebuild ms"))
+    for fmt, fields in (("items", ()), ("fields", ("iid", "values")), ("iids", ()), ("packed", ()), ("bitmap", ())):
+        t_enc, wire = timed(lambda: dumps((0, encode_result(states if fmt == "bitmap" else checked, fmt, fields))))
+        t_dec, result = timed(lambda: decode_result(loads(wire)[1], fmt))
+        if fmt == "bitmap":
+            result = index.checked_iids(result)
+            assert result == [str(i) for i in checked]
+        if fmt in ("iids", "packed", "bitmap"):
+            t_reb = "%14.2f" % (timed(index.items, result)[0] * 1e3)
+        else:
+            t_reb = "%14s" % "-"
+        print("%-8s %12i %12.2f %12.2f %s" % (fmt, len(wire), t_enc * 1e3, t_dec * 1e3, t_reb))
@@ -1,12 +1,27 @@
 from __future__ import annotations
 
-from typing import Callable, ParamSpec
+from typing import Callable, ParamSpec, Any, Literal, Iterator, Iterable, TYPE_CHECKING
 
-from multiprocessing import Process
-from os import kill as _kill, getpid
-from pickle import dumps, loads
-from socket import socket, AF_INET, SOCK_STREAM, SOL_SOCKET, SO_REUSEADDR, SHUT_RDWR
-from tkinter import Tk
+from atexit import register as _atexit_register
+from collections import deque
+from io import BytesIO
+from multiprocessing import Process, get_context, get_all_start_methods
+from multiprocessing.connection import Connection
+from threading import Thread, Lock
+from os import kill as _kill, getpid, pipe, write as _write, close as _close, environ, pathsep
+from pickle import dumps, loads, Pickler, HIGHEST_PROTOCOL
+from select import select
+from selectors import DefaultSelector, EVENT_READ
+from subprocess import Popen
+from sys import exc_info, executable, platform, path as _sys_path
+from socket import socket, SHUT_RDWR
+from time import monotonic
+from weakref import WeakSet
+
+from .transport import Transport, PipeEndpoint, FrameReader, make_transport, send_frame, writable
+
+if TYPE_CHECKING:
+    from tkinter import Tk
 
 try:
     # UNIX
@@ -17,73 +32,601 @@ except ImportError:
 
 _killsigs = (__sig1, __sig2, __sig3)
 
+try:
+    # UNIX
+    from resource import getrusage, RUSAGE_SELF
+except ImportError:
+    # WIN
+    getrusage = None
+
 _P = ParamSpec("_P")
 
 
+_PENDING = object()
+
+# popup -> main
+MSG_RESULT = 0
+MSG_EVENT = 1
+MSG_LOAD = 3
+MSG_META = 5
+MSG_HEARTBEAT = 6
+MSG_PROGRESS = 7
+# main -> popup
+MSG_PATCH = 2
+MSG_CHILDREN = 4
+MSG_RECORDS = 8
+
+_POLL_MS = 20
+
+HUNG_HEARTBEATS = 3
+# extra seconds for the first message (process start and `make`)
+HUNG_STARTUP = 5.0
+
+FORKSERVER_PRELOAD = ["__main__", "tkinter", "tkinter.ttk", __name__, __package__ + ".treeselect"]
+
+
+class PopupHung(TimeoutError):
+    pass
+
+
+def start_context(method: Literal["fork", "spawn", "forkserver"] | None = None):
+    context = get_context(method)
+    if method == "forkserver":
+        context.set_forkserver_preload(FORKSERVER_PRELOAD)
+    return context
+
+
 class TkBgReceiver:
 
-    server_address: tuple[str, int]
-    process: Process
-    sock: socket
+    server_address: object
+    transport: Transport
+    process: Process | Popen
+    sock: socket | PipeEndpoint
+    events: deque
+    on_event: Callable[[object], Any] | None
+    child_provider: Callable[[str], Iterable] | None
+    children_cache: dict[str, tuple]
+    on_close: list[Callable[[], Any]]
+    decode: Callable[[object], object] | None
+    metadata: dict[str, Any] | None
+    progress: object
+    on_progress: Callable[[object], Any] | None
+    hung_after: float | None
+    hung_startup: float
+    last_seen: float
 
     def __init__(
             self,
-            server_address: tuple[str, int],
-            process: Process,
+            transport: Transport,
+            process: Process | Popen,
     ):
-        self.server_address = server_address
+        self.transport = transport
+        self.server_address = transport.address
         self.process = process
-        self.sock = socket(AF_INET, SOCK_STREAM)
-        self.sock.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
-        self.sock.connect(self.server_address)
+        self.sock = transport.connect()
+        self._reader = FrameReader()
+        self._result = _PENDING
+        self.events = deque()
+        self.on_event = None
+        self.child_provider = None
+        self.children_cache = dict()
+        self.on_close = list()
+        self.decode = None
+        self.metadata = None
+        self.progress = None
+        self.on_progress = None
+        self.hung_after = None
+        self.hung_startup = 0.0
+        self.last_seen = monotonic()
+        self._heard = False
+        # `send` is called from feeder threads too
+        self._send_lock = Lock()
 
     def close(self):
         self.sock_kill()
 
     def sock_kill(self):
-        self.sock.shutdown(SHUT_RDWR)
+        try:
+            self.sock.shutdown(SHUT_RDWR)
+        except OSError:
+            pass
         self.sock.close()
+        self.transport.close()
+        while self.on_close:
+            self.on_close.pop()()
 
     def term_server(self):
         self.sock_kill()
         self.process.terminate()
 
-    def receive(self, block: bool = False, block_value: object = None) -> object:
-        self.sock.setblocking(block)
+    def _dispatch(self, kind: int, obj: object):
+        if kind == MSG_EVENT:
+            if self.on_event is not None:
+                self.on_event(obj)
+            else:
+                self.events.append(obj)
+        elif kind == MSG_LOAD:
+            self._provide_children(obj)
+        elif kind == MSG_PROGRESS:
+            self.progress = obj
+            if self.on_progress is not None:
+                self.on_progress(obj)
+
+    def _provide_children(self, iid: str):
         try:
-            data = b''
-            while _data := self.sock.recv(1024):
-                data += _data
-            return loads(data)
-        except BlockingIOError:
-            return block_value
+            children = self.children_cache[iid]
+        except KeyError:
+            try:
+                children = tuple(self.child_provider(iid))
+            except BaseException:
+                self.send(MSG_CHILDREN, (iid, None))
+                raise
+            self.children_cache[iid] = children
+        self.send(MSG_CHILDREN, (iid, children))
+
+    def _feed(self) -> object:
+        if self._result is _PENDING:
+            while (payload := self._reader.read(self.sock)) is not None:
+                self.last_seen = monotonic()
+                self._heard = True
+                kind, obj = loads(payload)
+                if kind == MSG_HEARTBEAT:
+                    continue
+                if kind == MSG_RESULT:
+                    self._result = obj if self.decode is None else self.decode(obj)
+                    if self.metadata is not None:
+                        self.metadata["phases"]["received"] = monotonic() - self.metadata["request"]
+                    break
+                if kind == MSG_META:
+                    self.metadata = obj
+                    continue
+                self._dispatch(kind, obj)
+        return self._result
+
+    def receive(self, block: bool = False, block_value: object = None, timeout: float | None = None) -> object:
+        self.sock.setblocking(False)
+        deadline = None if timeout is None else monotonic() + timeout
+        while (result := self._feed()) is _PENDING:
+            if deadline is None and not block:
+                self._check_hung()
+                return block_value
+            if not self._wait(deadline):
+                return block_value
+        return result
+
+    def _hung_at(self) -> float | None:
+        if self.hung_after is None:
+            return None
+        return self.last_seen + self.hung_after + (0.0 if self._heard else self.hung_startup)
+
+    @property
+    def hung(self) -> bool:
+        return (at := self._hung_at()) is not None and monotonic() >= at
+
+    def _check_hung(self):
+        if self.hung:
+            raise PopupHung("no message from the popup process for %.1f seconds" % (monotonic() - self.last_seen))
+
+    def _wait(self, deadline: float | None) -> bool:
+        while True:
+            self._check_hung()
+            ends = self._hung_at()
+            if deadline is not None:
+                ends = deadline if ends is None else min(ends, deadline)
+            if select((self.sock,), (), (), None if ends is None else max(ends - monotonic(), 0))[0]:
+                return True
+            if deadline is not None and monotonic() >= deadline:
+                return False
+
+    def send(self, kind: int, obj: object):
+        payload = dumps((kind, obj))
+        with self._send_lock:
+            send_frame(self.sock, payload)
+
+    def patch(self, op: str, *args):
+        self.send(MSG_PATCH, (op, *args))
+
+    def iter_events(self, timeout: float | None = None) -> Iterator[object]:
+        self.sock.setblocking(False)
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            done = self._feed() is not _PENDING
+            while self.events:
+                yield self.events.popleft()
+            if done or not self._wait(deadline):
+                return
 
     def __delete__(self):
         self.sock_kill()
 
 
+def as_completed(receivers: Iterable[TkBgReceiver], timeout: float | None = None) -> Iterator[TkBgReceiver]:
+    """yields the receivers as their popups finish, `receive()` then returns at once"""
+    deadline = None if timeout is None else monotonic() + timeout
+    selector = DefaultSelector()
+    try:
+        for recv in receivers:
+            recv.sock.setblocking(False)
+            selector.register(recv.sock, EVENT_READ, recv)
+        total = len(selector.get_map())
+        for key in tuple(selector.get_map().values()):
+            if _completed(key.data):
+                selector.unregister(key.fileobj)
+                yield key.data
+        while selector.get_map():
+            ends = [at for key in selector.get_map().values() if (at := key.data._hung_at()) is not None]
+            if deadline is not None:
+                if deadline <= monotonic():
+                    raise TimeoutError("%i of %i popups are not finished" % (len(selector.get_map()), total))
+                ends.append(deadline)
+            ready = selector.select(max(min(ends) - monotonic(), 0) if ends else None)
+            for key, _ in ready:
+                if _completed(key.data):
+                    selector.unregister(key.fileobj)
+                    yield key.data
+            for key in tuple(selector.get_map().values()):
+                if key.data.hung:
+                    selector.unregister(key.fileobj)
+                    yield key.data
+    finally:
+        selector.close()
+
+
+def _completed(recv: TkBgReceiver) -> bool:
+    try:
+        return recv._feed() is not _PENDING
+    except (EOFError, OSError):
+        return True
+
+
+def wait_any(receivers: Iterable[TkBgReceiver], timeout: float | None = None) -> TkBgReceiver | None:
+    try:
+        return next(as_completed(receivers, timeout), None)
+    except TimeoutError:
+        return None
+
+
+class AsyncTkBgReceiver:
+
+    receiver: TkBgReceiver
+
+    def __init__(self, receiver: TkBgReceiver):
+        self.receiver = receiver
+
+    async def receive(self, timeout: float | None = None) -> object:
+        from asyncio import get_running_loop, wait, wait_for, TimeoutError as AsyncTimeoutError
+
+        self.receiver.sock.setblocking(False)
+        if (result := self.receiver._feed()) is not _PENDING:
+            return result
+
+        loop = get_running_loop()
+        future = loop.create_future()
+
+        def readable():
+            if future.done():
+                return
+            try:
+                _result = self.receiver._feed()
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                if _result is not _PENDING:
+                    future.set_result(_result)
+
+        fd = self.receiver.sock.fileno()
+        loop.add_reader(fd, readable)
+        try:
+            if self.receiver.hung_after is None:
+                return await wait_for(future, timeout)
+            deadline = None if timeout is None else monotonic() + timeout
+            while True:
+                self.receiver._check_hung()
+                ends = self.receiver._hung_at()
+                if deadline is not None:
+                    if deadline <= monotonic():
+                        raise AsyncTimeoutError()
+                    ends = min(ends, deadline)
+                await wait((future,), timeout=max(ends - monotonic(), 0))
+                if future.done():
+                    return future.result()
+        finally:
+            loop.remove_reader(fd)
+
+    def close(self):
+        self.receiver.close()
+
+    def term_server(self):
+        self.receiver.term_server()
+
+
+def _serve(server: TkBgServer, make: Callable[..., Tk], args: tuple, kwargs: dict):
+    server.mark("process")
+    server.sock = server.transport.accept()
+    server.mark("connected")
+    server.tk = make(*args, **kwargs | dict(server=server))
+    server.mark("make")
+    if server.handlers:
+        server.listen()
+    if server.heartbeat:
+        server._beat()
+    server.tk.mainloop()
+    if "result" in server.phases:
+        return
+    try:
+        server.send(None)
+    except OSError as e:
+        if e.errno != 9:  # recv closed
+            raise
+
+
+def _memory() -> dict[str, int | None]:
+    try:
+        # Linux
+        with open("/proc/self/smaps_rollup") as f:
+            sizes = {k: int(v.split()[0]) * 1024 for k, v in (line.split(":", 1) for line in f if line.startswith(("Rss:", "Pss:")))}
+        return dict(rss=sizes["Rss"], pss=sizes["Pss"])
+    except (OSError, KeyError, ValueError):
+        pass
+    if getrusage is None:
+        return dict(rss=None, pss=None)
+    # peak only; kilobytes on Linux, bytes on macOS
+    return dict(rss=getrusage(RUSAGE_SELF).ru_maxrss * (1 if platform == "darwin" else 1024), pss=None)
+
+
+def _fd_socket(fd: int, family: int, type: int, proto: int) -> socket:
+    return socket(family, type, proto, fileno=fd)
+
+
+class _FdPickler(Pickler):
+
+    def __init__(self, file):
+        Pickler.__init__(self, file, HIGHEST_PROTOCOL)
+        self.fds = list()
+
+    def reducer_override(self, obj):
+        if isinstance(obj, socket):
+            self.fds.append(obj.fileno())
+            return _fd_socket, (obj.fileno(), obj.family, obj.type, obj.proto)
+        if isinstance(obj, Connection):
+            self.fds.append(obj.fileno())
+            return Connection, (obj.fileno(), obj.readable, obj.writable)
+        return NotImplemented
+
+
+_bootstrapped: WeakSet[Popen] = WeakSet()
+
+
+@_atexit_register
+def _terminate_bootstrapped():
+    for process in tuple(_bootstrapped):
+        if process.poll() is None:
+            process.terminate()
+
+
+def _start_bootstrap(server: TkBgServer, make: Callable[..., Tk], args: tuple, kwargs: dict, daemon: bool) -> Popen:
+    job = BytesIO()
+    pickler = _FdPickler(job)
+    pickler.dump((server, make, args, kwargs))
+    job_r, job_w = pipe()
+    env = dict(environ)
+    env["PYTHONPATH"] = pathsep.join(p for p in _sys_path if p)
+    try:
+        process = Popen(
+            (executable, "-m", __package__ + ".bootstrap", str(job_r)),
+            pass_fds=(job_r, *pickler.fds),
+            env=env,
+        )
+    finally:
+        _close(job_r)
+    if daemon:
+        _bootstrapped.add(process)
+
+    def write_job(data=job.getbuffer()):
+        try:
+            while data:
+                data = data[_write(job_w, data):]
+        finally:
+            _close(job_w)
+
+    Thread(target=write_job, daemon=True).start()
+    return process
+
+
+def _pool_worker(conn: Connection, warmup: Callable[[], Any] | None):
+    warm = warmup() if warmup is not None else None
+    warmed = monotonic()
+    try:
+        job = conn.recv()
+    except EOFError:
+        return
+    finally:
+        conn.close()
+    if job is None:
+        return
+    server, make, args, kwargs = job
+    server.warm = warm
+    server.phases["warmed"] = warmed
+    _serve(server, make, args, kwargs)
+
+
+class TkBgPool:
+    """pre-spawned popup processes that ran `warmup`, one popup each; `make` and its arguments are pickled"""
+
+    size: int
+    warmup: Callable[[], Any] | None
+    daemon: bool
+
+    def __init__(
+            self,
+            size: int = 2,
+            warmup: Callable[[], Any] | None = None,
+            daemon: bool = True,
+            start_method: Literal["spawn", "forkserver"] | None = None,
+    ):
+        self.size = size
+        self.warmup = warmup
+        self.daemon = daemon
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in get_all_start_methods() else "spawn"
+        self._context = start_context(start_method)
+        self._ready: deque[tuple[Process, Connection]] = deque()
+        self._lock = Lock()
+        self._closed = False
+        self.refill()
+
+    def _spawn(self) -> tuple[Process, Connection]:
+        conn_recv, conn_send = self._context.Pipe(duplex=False)
+        process = self._context.Process(target=_pool_worker, args=(conn_recv, self.warmup), daemon=self.daemon)
+        process.start()
+        conn_recv.close()
+        return process, conn_send
+
+    def refill(self):
+        with self._lock:
+            while not self._closed and len(self._ready) < self.size:
+                self._ready.append(self._spawn())
+
+    def ready(self) -> int:
+        with self._lock:
+            return sum(p.is_alive() for p, _ in self._ready)
+
+    def submit(self, server: TkBgServer, make: Callable[..., Tk], args: tuple, kwargs: dict) -> Process:
+        with self._lock:
+            while self._ready:
+                process, conn = self._ready.popleft()
+                if process.is_alive():
+                    break
+                conn.close()
+            else:
+                process, conn = self._spawn()
+        conn.send((server, make, args, kwargs))
+        conn.close()
+        Thread(target=self.refill, daemon=True).start()
+        return process
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            while self._ready:
+                process, conn = self._ready.popleft()
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass
+                conn.close()
+
+    def __enter__(self) -> TkBgPool:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
 class TkBgServer:
 
     tk: Tk
-    sock: socket
+    warm: Any
+    transport: Transport
+    sock: socket | PipeEndpoint
+    handlers: dict[int, Callable[[object], Any]]
     instand_return: bool
     instand_block: bool
     daemon: bool
+    pool: TkBgPool | None
+    phases: dict[str, float]
+    heartbeat: float | None
+    hung_after: float | None
+    hung_startup: float
 
     def kill(self):
         pid = getpid()
         for sig in _killsigs:
             _kill(pid, sig)
 
+    def mark(self, phase: str):
+        self.phases.setdefault(phase, monotonic())
+
+    def metadata(self) -> dict[str, Any]:
+        request = self.phases["request"]
+        return dict(
+            pid=getpid(),
+            warm=self.warm is not None,
+            **_memory(),
+            request=request,
+            phases={k: t - request for k, t in sorted(self.phases.items(), key=lambda kt: kt[1]) if k != "request"},
+        )
+
     def send(self, obj: object):
-        conn, addr = self.sock.accept()
-        return conn.send(dumps(obj))
+        self.mark("result")
+        self.send_message(MSG_META, self.metadata())
+        self.send_message(MSG_RESULT, obj)
+
+    def send_event(self, event: object):
+        self.send_message(MSG_EVENT, event)
+
+    def progress(self, obj: object):
+        self.send_message(MSG_PROGRESS, obj)
+
+    def _beat(self):
+        try:
+            # never block on a main process that doesn't read
+            if writable(self.sock):
+                self.send_message(MSG_HEARTBEAT, None)
+        except (OSError, ValueError):
+            self._beating = None
+            return
+        self._beating = self.tk.after(int(self.heartbeat * 1000), self._beat)
+
+    def send_message(self, kind: int, obj: object):
+        send_frame(self.sock, dumps((kind, obj)))
+
+    def listen(self):
+        from tkinter import READABLE
+        self.sock.setblocking(False)
+        self._reader = FrameReader()
+        try:
+            # UNIX
+            self.tk.tk.createfilehandler(self.sock, READABLE, lambda *_: self._poll())
+            self._listening = "file"
+        except AttributeError:
+            # WIN
+            self._listening = self.tk.after(_POLL_MS, self._poll)
+
+    def _unlisten(self):
+        if self._listening == "file":
+            self.tk.tk.deletefilehandler(self.sock)
+        elif self._listening:
+            self.tk.after_cancel(self._listening)
+        self._listening = None
+
+    def _poll(self):
+        try:
+            while (payload := self._reader.read(self.sock)) is not None:
+                kind, obj = loads(payload)
+                try:
+                    self.handlers[kind](obj)
+                except Exception:
+                    self.tk.report_callback_exception(*exc_info())
+        except (EOFError, OSError):
+            self._unlisten()
+            return
+        if self._listening and self._listening != "file":
+            self._listening = self.tk.after(_POLL_MS, self._poll)
 
     def sock_kill(self):
-        self.sock.shutdown(SHUT_RDWR)
+        try:
+            self.sock.shutdown(SHUT_RDWR)
+        except OSError:
+            pass
         self.sock.close()
 
     def exit(self):
+        if self._listening:
+            self._unlisten()
+        if self._beating:
+            self.tk.after_cancel(self._beating)
+            self._beating = None
         self.tk.destroy()
         self.sock_kill()
 
@@ -93,42 +636,71 @@ class TkBgServer:
     def __init__(
             self, 
             address: str = "127.0.0.11",
-            port: int = 50_000,
+            port: int = 0,
             daemon: bool = True,
             instand_return: bool = False,
             instand_return_blocking: bool = True,
+            pool: TkBgPool | None = None,
+            transport: Literal["tcp", "unix", "socketpair", "pipe"] | Callable[[], Transport] = "tcp",
+            receiver_setup: Callable[[TkBgReceiver], Any] | None = None,
+            start_method: Literal["fork", "spawn", "forkserver", "bootstrap"] | None = None,
+            heartbeat: float | None = None,
+            hung_after: float | None = None,
+            hung_startup: float = HUNG_STARTUP,
     ):
         self.server_address = (address, port)
+        self.transport_kind = transport
+        self.receiver_setup = receiver_setup
+        self.start_method = start_method
         self.instand_return = instand_return
         self.instand_block = instand_return_blocking
         self.daemon = daemon
+        self.pool = pool
+        self.warm = None
+        self.phases = dict()
+        self.handlers = dict()
+        self.heartbeat = heartbeat
+        self.hung_after = hung_after if hung_after is not None or not heartbeat else HUNG_HEARTBEATS * heartbeat
+        self.hung_startup = hung_startup
+        self._listening = None
+        self._beating = None
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state.pop("pool", None)
+        state.pop("transport_kind", None)
+        state.pop("receiver_setup", None)
+        return state
 
     def __call__(self, make: Callable[[TkBgServer, _P], Tk]) -> Callable[[_P], TkBgReceiver | object]:
 
         def wrapper(*args, **kwargs) -> TkBgReceiver | object:
 
-            self.sock = socket(AF_INET, SOCK_STREAM)
-            self.sock.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
-            self.sock.bind(self.server_address)
-            self.sock.listen(1)
+            self.phases = dict(request=monotonic())
+            self.transport = make_transport(self.transport_kind, *self.server_address)
 
-            def proc(*_args, _sock=self.sock, **_kwargs):
-                self.sock = _sock
-                self.tk = make(*_args, **_kwargs | dict(server=self))
-                self.tk.mainloop()
-                try:
-                    self.send(None)
-                except OSError as e:
-                    if e.errno != 9:  # recv closed
-                        raise
-                return
+            if self.pool is not None:
+                process = self.pool.submit(self, make, args, kwargs)
+            elif self.start_method == "bootstrap":
+                process = _start_bootstrap(self, make, args, kwargs, self.daemon)
+            else:
+                process = start_context(self.start_method).Process(target=_serve, args=(self, make, args, kwargs), daemon=self.daemon)
+                process.start()
+            recv = TkBgReceiver(self.transport, process)
+            recv.hung_after = self.hung_after
+            recv.hung_startup = self.hung_startup
+
+            self.transport.detach()
 
-            process = Process(target=proc, args=args, kwargs=kwargs, daemon=self.daemon)
-            recv = TkBgReceiver(self.server_address, process)
-            process.start()
+            if self.receiver_setup is not None:
+                self.receiver_setup(recv)
 
             if self.instand_return:
-                return recv.receive(self.instand_block)
+                try:
+                    return recv.receive(self.instand_block)
+                except PopupHung:
+                    recv.term_server()
+                    raise
             else:
                 return recv
 
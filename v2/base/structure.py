@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+from typing import Generator, Literal, Any, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import tkinter.ttk as ttk
+
+
+class TagsConfig:
+    t_entry = "t-entry"
+    t_sector = "t-sector-is"
+    t_top_sector = "t-sector-top"
+    t_sub_sector = "t-sector-sub"
+    c_check_entry = "c-check"
+    c_uncheck_entry = "c-uncheck"
+    c_check_sector = "c-check-sector"
+    c_uncheck_sector = "c-uncheck-sector"
+    c_cstate_sector = "c-cstate-sector"
+    m_match_entry = "m-1-entry"
+    m_match_sector = "m-1-sector"
+    m_hint_sector = "m-2-sector"
+    m_match_and_hint_sector = "m-3-sector"
+    p_placeholder = "p-placeholder"
+
+    def __init__(
+            self,
+            match_entry: dict[Literal["foreground", "background", "font", "image"], Any] = None,
+            match_sector: dict[Literal["foreground", "background", "font", "image"], Any] = None,
+            match_hint_sector: dict[Literal["foreground", "background", "font", "image"], Any] = None,
+            match_hint_and_match_sector: dict[Literal["foreground", "background", "font", "image"], Any] = None,
+            uncheck_entry: dict[Literal["foreground", "background", "font", "image"], Any] = None,
+            check_entry: dict[Literal["foreground", "background", "font", "image"], Any] = None,
+            uncheck_sector: dict[Literal["foreground", "background", "font", "image"], Any] = None,
+            check_sector: dict[Literal["foreground", "background", "font", "image"], Any] = None,
+            cstate_sector: dict[Literal["foreground", "background", "font", "image"], Any] = None,
+            type_entry: dict[Literal["foreground", "background", "font", "image"], Any] = None,
+            type_sector: dict[Literal["foreground", "background", "font", "image"], Any] = None,
+            type_top_sector: dict[Literal["foreground", "background", "font", "image"], Any] = None,
+            type_sub_sector: dict[Literal["foreground", "background", "font", "image"], Any] = None,
+    ):
+        config = {
+            TagsConfig.c_check_entry: check_entry,
+            TagsConfig.c_uncheck_entry: uncheck_entry,
+            TagsConfig.c_check_sector: check_sector,
+            TagsConfig.c_uncheck_sector: uncheck_sector,
+            TagsConfig.c_cstate_sector: cstate_sector,
+            TagsConfig.m_match_entry: match_entry,
+            TagsConfig.m_match_sector: match_sector,
+            TagsConfig.m_hint_sector: match_hint_sector,
+            TagsConfig.m_match_and_hint_sector: match_hint_and_match_sector,
+            TagsConfig.t_entry: type_entry,
+            TagsConfig.t_sector: type_sector,
+            TagsConfig.t_top_sector: type_top_sector,
+            TagsConfig.t_sub_sector: type_sub_sector,
+        }
+        self.config = {k: v for k, v in config.items() if v is not None}
+
+    def configure(self, tree: ttk.Treeview):
+
+        for tag, kw in self.config.items():
+            # (Trial-and-Error knowledge)
+            # If the PhotoImages are not saved in an attribute of the object, they are not displayed.
+            # They are probably deleted in the process by the garbage collector.
+            for itm in kw.items():
+                attr = "_%s_%s" % (tag, itm[0])
+                setattr(tree, attr, itm[1])
+                kw[itm[0]] = getattr(tree, attr)
+
+            tree.tag_configure(tag, **kw)
+
+    def __or__(self, other: TagsConfig):
+        new = TagsConfig()
+        new.config = self.config | other.config
+        return new
+
+
+class _NotLoaded:
+
+    def __repr__(self):
+        return "NOT_LOADED"
+
+    def __reduce__(self):
+        return "NOT_LOADED"
+
+
+# StructureNode("label", "values", NOT_LOADED): sector whose children are requested when it is opened
+NOT_LOADED = _NotLoaded()
+
+
+class StructureNode(tuple[str, str, Any, tuple, bool]):
+    __slots__ = ()
+
+    def __new__(cls, label: str, values: Any, *children: StructureNode, iid: str = None, checked: bool = False, opened: bool = False) -> StructureNode:
+        return tuple.__new__(cls, (iid or label, label, values, children, checked, opened))
+
+    @property
+    def has_child(self) -> bool:
+        return bool(self[3])
+
+    @property
+    def loaded(self) -> bool:
+        return self[3] != (NOT_LOADED,)
+
+    def __getnewargs_ex__(self):
+        return (self[1], self[2], *self[3]), dict(iid=self[0], checked=self[4], opened=self[5])
+
+    def child_iter(self) -> Generator[str]:
+        """the iids of the node and of its descendants in preorder"""
+        def gen():
+            stack = [iter((self,))]
+            while stack:
+                node = next(stack[-1], None)
+                if node is None:
+                    stack.pop()
+                    continue
+                yield node[0]
+                if node[3] != (NOT_LOADED,):
+                    stack.append(iter(node[3]))
+        return gen()
+
+
+# a node of a streamed structure (see `SelectTree.add_records`): (path, label, values, checked),
+# the path is the iid or the tuple of the node iids from the top level
+Record = tuple[str | tuple[str, ...], str, Any, bool]
+
+
+class ThreeItem(str):
+    text: str
+    image: Any
+    values: list[Any] | tuple[Any, ...] | Literal[""]
+    open: bool
+    tags: str | list[str] | tuple[str, ...]
+    is_sector: bool
+
+    def __new__(
+            cls,
+            iid: str,
+            text: str,
+            image: Any,
+            values: list[Any] | tuple[Any, ...] | Literal[""],
+            open: bool,
+            tags: str | list[str] | tuple[str, ...],
+            is_sector: bool
+    ):
+        new = str.__new__(cls, iid)
+        new.text = text
+        new.image = image
+        new.values = values
+        new.open = open
+        new.tags = tags
+        new.is_sector = is_sector
+        return new
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.__class__.__annotations__} | {"iid": str(self)}
+
+    @staticmethod
+    def from_dict(__attrdict) -> ThreeItem:
+        return ThreeItem(**__attrdict)
+
+    def __getnewargs__(self):
+        return self, self.text, self.image, self.values, self.open, self.tags, self.is_sector
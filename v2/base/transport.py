@@ -0,0 +1,341 @@
+from __future__ import annotations
+
+from typing import Callable, Literal
+
+from errno import EBADF
+from multiprocessing import Pipe
+from multiprocessing.connection import Connection
+from os import read as _read, readv as _readv, write as _write, set_blocking, unlink, rmdir
+from os.path import join
+from select import select
+from socket import socket, socketpair, AF_INET, SOCK_STREAM, SOL_SOCKET, SO_REUSEADDR, SHUT_RDWR
+from struct import Struct
+from tempfile import mkdtemp
+
+try:
+    # UNIX
+    from socket import AF_UNIX
+except ImportError:
+    # WIN
+    AF_UNIX = None
+
+
+class Transport:
+    """channel to one popup process: the main process `connect`s, the popup `accept`s, both ends are socket-like"""
+
+    name: str
+    address: object
+
+    def connect(self) -> socket | PipeEndpoint:
+        raise NotImplementedError
+
+    def accept(self) -> socket | PipeEndpoint:
+        raise NotImplementedError
+
+    def detach(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _ListenerTransport(Transport):
+
+    listener: socket
+
+    def _listen(self, family: int, address: object):
+        self.listener = socket(family, SOCK_STREAM)
+        if family == AF_INET:
+            self.listener.setsockopt(SOL_SOCKET, SO_REUSEADDR, 1)
+        self.listener.bind(address)
+        self.listener.listen(1)
+        self.address = self.listener.getsockname()
+        self._family = family
+
+    def connect(self) -> socket:
+        sock = socket(self._family, SOCK_STREAM)
+        sock.connect(self.address)
+        return sock
+
+    def accept(self) -> socket:
+        conn, addr = self.listener.accept()
+        self.listener.close()
+        return conn
+
+    def detach(self):
+        self.listener.close()
+
+
+class TcpTransport(_ListenerTransport):
+    """loopback TCP, `port=0` allocates a free port"""
+
+    name = "tcp"
+    address: tuple[str, int]
+
+    def __init__(self, address: str = "127.0.0.1", port: int = 0):
+        self._listen(AF_INET, (address, port))
+
+
+class UnixTransport(_ListenerTransport):
+    """AF_UNIX socket in a private temporary directory (UNIX only)"""
+
+    name = "unix"
+    address: str
+
+    def __init__(self, path: str = None):
+        if AF_UNIX is None:
+            raise OSError("AF_UNIX is not available on this platform")
+        self._dir = None
+        if path is None:
+            self._dir = mkdtemp(prefix="tkbg-")
+            path = join(self._dir, "sock")
+        self._listen(AF_UNIX, path)
+
+    def detach(self):
+        _ListenerTransport.detach(self)
+        self.close()
+
+    def close(self):
+        try:
+            unlink(self.address)
+            if self._dir:
+                rmdir(self._dir)
+        except OSError:
+            pass
+
+
+class SocketPairTransport(Transport):
+    """connected `socketpair`, inherited by the popup process"""
+
+    name = "socketpair"
+
+    def __init__(self):
+        self._main, self._popup = socketpair()
+        self.address = None
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state.pop("_main", None)
+        return state
+
+    def connect(self) -> socket:
+        return self._main
+
+    def accept(self) -> socket:
+        if hasattr(self, "_main"):
+            self._main.close()
+        return self._popup
+
+    def detach(self):
+        self._popup.close()
+
+
+class PipeEndpoint:
+    """socket-like end of two one-way `multiprocessing` pipes"""
+
+    reader: Connection
+    writer: Connection
+
+    def __init__(self, reader: Connection, writer: Connection):
+        self.reader = reader
+        self.writer = writer
+        self._rfd = reader.fileno()
+        self._wfd = writer.fileno()
+
+    def _check(self):
+        if self.reader.closed:
+            raise OSError(EBADF, "endpoint is closed")
+
+    def fileno(self) -> int:
+        self._check()
+        return self._rfd
+
+    def setblocking(self, flag: bool):
+        self._check()
+        set_blocking(self._rfd, flag)
+
+    def recv(self, bufsize: int) -> bytes:
+        self._check()
+        return _read(self._rfd, bufsize)
+
+    def recv_into(self, buffer, nbytes: int = 0) -> int:
+        self._check()
+        if nbytes:
+            buffer = memoryview(buffer)[:nbytes]
+        return _readv(self._rfd, (buffer,))
+
+    def send(self, data) -> int:
+        self._check()
+        return _write(self._wfd, data)
+
+    def sendall(self, data):
+        data = memoryview(data)
+        while data:
+            data = data[self.send(data):]
+
+    def shutdown(self, how: int = SHUT_RDWR):
+        self.writer.close()
+
+    def close(self):
+        self.writer.close()
+        self.reader.close()
+
+
+class PipeTransport(Transport):
+    """two one-way `multiprocessing` pipes (UNIX only, the ends are used as file descriptors)"""
+
+    name = "pipe"
+
+    def __init__(self):
+        self._main_r, self._popup_w = Pipe(duplex=False)
+        self._popup_r, self._main_w = Pipe(duplex=False)
+        self.address = None
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state.pop("_main_r", None)
+        state.pop("_main_w", None)
+        return state
+
+    def connect(self) -> PipeEndpoint:
+        return PipeEndpoint(self._main_r, self._main_w)
+
+    def accept(self) -> PipeEndpoint:
+        if hasattr(self, "_main_r"):
+            self._main_r.close()
+            self._main_w.close()
+        return PipeEndpoint(self._popup_r, self._popup_w)
+
+    def detach(self):
+        self._popup_r.close()
+        self._popup_w.close()
+
+
+TRANSPORTS: dict[str, Callable[[], Transport]] = {
+    "tcp": TcpTransport,
+    "unix": UnixTransport,
+    "socketpair": SocketPairTransport,
+    "pipe": PipeTransport,
+}
+
+
+def make_transport(
+        kind: Literal["tcp", "unix", "socketpair", "pipe"] | Callable[[], Transport] = "tcp",
+        address: str = "127.0.0.1",
+        port: int = 0,
+) -> Transport:
+    if callable(kind):
+        return kind()
+    if kind == "tcp":
+        return TcpTransport(address, port)
+    return TRANSPORTS[kind]()
+
+
+# frame: <payload length: uint64 big-endian><payload>
+HEADER = Struct("!Q")
+
+_SMALL_FRAME = 1 << 16
+
+
+def _sendall(end: socket | PipeEndpoint, data):
+    # `socket.sendall` fails on non-blocking sockets
+    view = memoryview(data)
+    while view:
+        try:
+            view = view[end.send(view):]
+        except BlockingIOError:
+            select((), (end,), ())
+
+
+def writable(end: socket | PipeEndpoint) -> bool:
+    return bool(select((), (end.writer if isinstance(end, PipeEndpoint) else end,), (), 0)[1])
+
+
+def send_frame(end: socket | PipeEndpoint, payload: bytes):
+    if len(payload) < _SMALL_FRAME:
+        _sendall(end, HEADER.pack(len(payload)) + payload)
+    else:
+        _sendall(end, HEADER.pack(len(payload)))
+        _sendall(end, payload)
+
+
+class FrameReader:
+    """reads length prefixed frames with `recv_into`, a partial frame is kept across calls"""
+
+    def __init__(self):
+        self._header = bytearray(HEADER.size)
+        self._payload = None
+        self._view = memoryview(self._header)
+
+    @property
+    def pending(self) -> bool:
+        return self._payload is not None or len(self._view) != HEADER.size
+
+    def read(self, end: socket | PipeEndpoint) -> bytearray | None:
+        """None if a non-blocking `end` would block"""
+        while True:
+            if self._view:
+                try:
+                    n = end.recv_into(self._view)
+                except BlockingIOError:
+                    return None
+                if not n:
+                    raise EOFError("connection closed by peer")
+                self._view = self._view[n:]
+                if self._view:
+                    continue
+            if self._payload is None:
+                self._payload = bytearray(HEADER.unpack(self._header)[0])
+                self._view = memoryview(self._payload)
+            else:
+                payload = self._payload
+                self._payload = None
+                self._view = memoryview(self._header)
+                return payload
+
+
+def _echo(transport: Transport):
+    end = transport.accept()
+    reader = FrameReader()
+    try:
+        while True:
+            send_frame(end, reader.read(end))
+    except EOFError:
+        pass
+    end.close()
+
+
+if __name__ == '__main__':
+    # python -m v2.base.transport [rounds] [size]
+    from multiprocessing import Process
+    from statistics import median
+    from sys import argv
+    from time import perf_counter
+
+    rounds = int(argv[1]) if len(argv) > 1 else 5_000
+    size = int(argv[2]) if len(argv) > 2 else 64
+    msg = bytes(size)
+
+    print("%-12s %10s %10s %10s" % ("transport", "median µs", "mean µs", "min µs"))
+    for kind in TRANSPORTS:
+        try:
+            transport = make_transport(kind)
+        except OSError as e:
+            print("%-12s %s" % (kind, e))
+            continue
+        process = Process(target=_echo, args=(transport,), daemon=True)
+        process.start()
+        end = transport.connect()
+        transport.detach()
+        reader = FrameReader()
+        times = list()
+        for _ in range(rounds):
+            t = perf_counter()
+            send_frame(end, msg)
+            reader.read(end)
+            times.append(perf_counter() - t)
+        end.shutdown(SHUT_RDWR)
+        end.close()
+        process.join()
+        transport.close()
+        print("%-12s %10.1f %10.1f %10.1f" % (kind, median(times) * 1e6, sum(times) / rounds * 1e6, min(times) * 1e6))
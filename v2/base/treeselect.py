@@ -1,143 +1,85 @@
 from __future__ import annotations
 
-from typing import Generator, Callable
+from typing import Callable, Iterator
 
 import tkinter as tk
 import tkinter.ttk as ttk
 
 from re import Pattern, search, compile, IGNORECASE, error as ReError, escape
-from typing import Literal, Any, Iterable
+from typing import Literal, Any, Iterable, Sequence
 from pathlib import Path
+from base64 import b64encode
+from collections import deque
+from itertools import islice
+from typing import TYPE_CHECKING
 
+from .structure import TagsConfig, StructureNode, ThreeItem, NOT_LOADED, Record
 
-class TagsConfig:
-    t_entry = "t-entry"
-    t_sector = "t-sector-is"
-    t_top_sector = "t-sector-top"
-    t_sub_sector = "t-sector-sub"
-    c_check_entry = "c-check"
-    c_uncheck_entry = "c-uncheck"
-    c_check_sector = "c-check-sector"
-    c_uncheck_sector = "c-uncheck-sector"
-    c_cstate_sector = "c-cstate-sector"
-    m_match_entry = "m-1-entry"
-    m_match_sector = "m-1-sector"
-    m_hint_sector = "m-2-sector"
-    m_match_and_hint_sector = "m-3-sector"
+if TYPE_CHECKING:
+    from .flatstruct import FlatStructure
 
-    def __init__(
-            self,
-            match_entry: dict[Literal["foreground", "background", "font", "image"], Any] = None,
-            match_sector: dict[Literal["foreground", "background", "font", "image"], Any] = None,
-            match_hint_sector: dict[Literal["foreground", "background", "font", "image"], Any] = None,
-            match_hint_and_match_sector: dict[Literal["foreground", "background", "font", "image"], Any] = None,
-            uncheck_entry: dict[Literal["foreground", "background", "font", "image"], Any] = None,
-            check_entry: dict[Literal["foreground", "background", "font", "image"], Any] = None,
-            uncheck_sector: dict[Literal["foreground", "background", "font", "image"], Any] = None,
-            check_sector: dict[Literal["foreground", "background", "font", "image"], Any] = None,
-            cstate_sector: dict[Literal["foreground", "background", "font", "image"], Any] = None,
-            type_entry: dict[Literal["foreground", "background", "font", "image"], Any] = None,
-            type_sector: dict[Literal["foreground", "background", "font", "image"], Any] = None,
-            type_top_sector: dict[Literal["foreground", "background", "font", "image"], Any] = None,
-            type_sub_sector: dict[Literal["foreground", "background", "font", "image"], Any] = None,
-    ):
-        config = {
-            TagsConfig.c_check_entry: check_entry,
-            TagsConfig.c_uncheck_entry: uncheck_entry,
-            TagsConfig.c_check_sector: check_sector,
-            TagsConfig.c_uncheck_sector: uncheck_sector,
-            TagsConfig.c_cstate_sector: cstate_sector,
-            TagsConfig.m_match_entry: match_entry,
-            TagsConfig.m_match_sector: match_sector,
-            TagsConfig.m_hint_sector: match_hint_sector,
-            TagsConfig.m_match_and_hint_sector: match_hint_and_match_sector,
-            TagsConfig.t_entry: type_entry,
-            TagsConfig.t_sector: type_sector,
-            TagsConfig.t_top_sector: type_top_sector,
-            TagsConfig.t_sub_sector: type_sub_sector,
-        }
-        self.config = {k: v for k, v in config.items() if v is not None}
-
-    def configure(self, tree: ttk.Treeview):
-
-        for tag, kw in self.config.items():
-            # (Trial-and-Error knowledge)
-            # If the PhotoImages are not saved in an attribute of the object, they are not displayed.
-            # They are probably deleted in the process by the garbage collector.
-            for itm in kw.items():
-                attr = "_%s_%s" % (tag, itm[0])
-                setattr(tree, attr, itm[1])
-                kw[itm[0]] = getattr(tree, attr)
-
-            tree.tag_configure(tag, **kw)
-
-    def __or__(self, other: TagsConfig):
-        new = TagsConfig()
-        new.config = self.config | other.config
-        return new
-
-
-class StructureNode(tuple[str, str, Any, tuple, bool]):
-
-    def __new__(cls, label: str, values: Any, *children: StructureNode, iid: str = None, checked: bool = False, opened: bool = False) -> StructureNode:
-        new = tuple.__new__(cls, (iid or label, label, values, children, checked, opened))
-        new.has_child = bool(children)
-        return new
-
-    def child_iter(self) -> Generator[str]:
-        def gen():
-            yield self[0]
-            for c in self[3]:
-                c: StructureNode
-                ci = c.child_iter()
-                for i in ci:
-                    yield i
-        return gen()
-
-
-class ThreeItem(str):
-    text: str
-    image: Any
-    values: list[Any] | tuple[Any, ...] | Literal[""]
-    open: bool
-    tags: str | list[str] | tuple[str, ...]
-    is_sector: bool
-
-    def __new__(
-            cls,
-            iid: str,
-            text: str,
-            image: Any,
-            values: list[Any] | tuple[Any, ...] | Literal[""],
-            open: bool,
-            tags: str | list[str] | tuple[str, ...],
-            is_sector: bool
-    ):
-        new = str.__new__(cls, iid)
-        new.text = text
-        new.image = image
-        new.values = values
-        new.open = open
-        new.tags = tags
-        new.is_sector = is_sector
-        return new
-
-    def to_dict(self):
-        return {k: getattr(self, k) for k in self.__class__.__annotations__} | {"iid": str(self)}
 
-    @staticmethod
-    def from_dict(__attrdict) -> ThreeItem:
-        return ThreeItem(**__attrdict)
+_CHECKBOX_FILES = {
+    "checked": "checkbox_checked18.png",
+    "unchecked": "checkbox_unchecked18.png",
+    "cstate": "checkbox_hover18.png",
+}
 
-    def __getnewargs__(self):
-        return self, self.text, self.image, self.values, self.open, self.tags, self.is_sector
+_CHECKBOX_DATA = {
+    k: b64encode((Path(__file__).parent / "dat" / f).read_bytes()).decode() for k, f in _CHECKBOX_FILES.items()
+}
+
+
+def load_checkbox_images(master) -> dict[str, tk.PhotoImage]:
+    root = master._root()
+    try:
+        return root.select_tree_images
+    except AttributeError:
+        root.select_tree_images = {
+            k: tk.PhotoImage(data=data, format="png", master=root) for k, data in _CHECKBOX_DATA.items()
+        }
+        return root.select_tree_images
+
+
+# one Tcl call per batch of rows
+_INSERT_PROC = "::select_tree_insert"
+_INSERT_SCRIPT = """
+proc %s {w rows} {
+    foreach {parent index iid text values tags open} $rows {
+        $w insert $parent $index -id $iid -text $text -values $values -tags $tags -open $open
+    }
+}
+""" % _INSERT_PROC
+_INSERT_BATCH = 20_000
+
+_CHECK_STATES = {
+    TagsConfig.c_check_entry: True,
+    TagsConfig.c_check_sector: True,
+    TagsConfig.c_uncheck_entry: False,
+    TagsConfig.c_uncheck_sector: False,
+    TagsConfig.c_cstate_sector: None,
+}
+_CHECK_CODES = {
+    TagsConfig.c_check_entry: 1,
+    TagsConfig.c_check_sector: 1,
+    TagsConfig.c_uncheck_entry: 0,
+    TagsConfig.c_uncheck_sector: 0,
+    TagsConfig.c_cstate_sector: 2,
+}
 
 
 class SelectTree(ttk.Treeview):
-    top_sector_iids: tuple[str, ...]
-    sub_sector_iids: tuple[str, ...]
-    all_sector_iids: tuple[str, ...]
-    entry_iids: tuple[str, ...]
+
+    event_sink: Callable[[tuple], Any] | None = None
+    children_loader: Callable[[str], Any] | None = None
+
+    unloaded: set[str]
+    lazy: bool
+    batch_insert: bool = True
+    stream_chunk: int = 2_000
+    on_records: Callable[[int, bool], Any] | None = None
+    records_inserted: int
+    records_done: bool
 
     def __init__(
             self,
@@ -146,6 +88,9 @@ class SelectTree(ttk.Treeview):
             tags_config: TagsConfig,
             master=None,
             width: int = None,
+            flat: FlatStructure | None = None,
+            lazy: bool = False,
+            records: Iterable[Record] | None = None,
             **tk_kwargs
     ):
         ttk.Treeview.__init__(self, master, show="tree", **tk_kwargs)
@@ -155,43 +100,487 @@ class SelectTree(ttk.Treeview):
 
         tags_config.configure(self)
 
+        self.iid_sep = iid_sep
+        self.unloaded = set()
+        self._placeholders = set()
+        self._requested = set()
+        self.lazy = lazy
+        # lazy: closed sector -> its children, not inserted yet
+        self._deferred: dict[str, tuple[StructureNode, ...] | list[tuple]] = dict()
+        self._deferred_check: dict[str, bool] = dict()
+        self._deferred_closed: set[str] = set()
+        self._hidden_parent: dict[str, str] = dict()
+        # mirror the Tk tags and open option
+        self._t_tags: dict[str, tuple[str, ...]] = dict()
+        self._c_tags: dict[str, str] = dict()
+        self._m_tags: dict[str, str] = dict()
+        self._open_items: set[str] = set()
+        self._parent: dict[str, str] = dict()
+        self._children: dict[str, list[str]] = {"": []}
+
+        preorder = list()
+        self._preorder_ends: list[int] = list()
+        top_sector_iids, sub_sector_iids, entry_iids = self._make(structure, preorder=preorder, ends=self._preorder_ends)
+        if flat is not None:
+            for iids, new_iids in zip((top_sector_iids, sub_sector_iids, entry_iids), self._make_flat(flat, preorder, self._preorder_ends)):
+                iids += new_iids
+        self._preorder = preorder
+        self._preorder_index = None
+        self._preorder_tree = True
+
+        self._top_sector_iids = top_sector_iids
+        self._sub_sector_iids = sub_sector_iids
+        self._entry_iids = entry_iids
+        self._frozen: dict[str, tuple[str, ...]] = dict()
+
+        self.bind("<<TreeviewOpen>>", lambda e: self._opened(self.focus()), add=True)
+        self.bind("<<TreeviewClose>>", lambda e: self._open_items.discard(self.focus()), add=True)
+
+        self.records_inserted = 0
+        self.records_done = True
+        self._record_queue: deque[Iterator[Record]] = deque()
+        self._record_held: tuple | None = None
+        self._record_stack: list[tuple[str, int]] = list()
+        self._record_job = None
+        if records is not None:
+            self.add_records(records)
+
+    @property
+    def top_sector_iids(self) -> tuple[str, ...]:
+        if (t := self._frozen.get("top")) is None:
+            t = self._frozen["top"] = tuple(self._top_sector_iids)
+        return t
+
+    @property
+    def sub_sector_iids(self) -> tuple[str, ...]:
+        if (t := self._frozen.get("sub")) is None:
+            t = self._frozen["sub"] = tuple(self._sub_sector_iids)
+        return t
+
+    @property
+    def all_sector_iids(self) -> tuple[str, ...]:
+        if (t := self._frozen.get("all")) is None:
+            t = self._frozen["all"] = self.top_sector_iids + self.sub_sector_iids
+        return t
+
+    @property
+    def entry_iids(self) -> tuple[str, ...]:
+        if (t := self._frozen.get("entry")) is None:
+            t = self._frozen["entry"] = tuple(self._entry_iids)
+        return t
+
+    @property
+    def structure_preorder(self) -> tuple[str, ...]:
+        if (t := self._frozen.get("preorder")) is None:
+            t = self._frozen["preorder"] = tuple(self._preorder)
+        return t
+
+    def _make(
+            self,
+            structure: Iterable[StructureNode],
+            parent: str = "",
+            index: int | str = "end",
+            preorder: list[str] = None,
+            check: bool | None = None,
+            materialize: bool = False,
+            closed: bool = False,
+            ends: list[int] = None,
+    ) -> tuple[list[str], list[str], list[str]]:
         top_sector_iids = list()
         sub_sector_iids = list()
         entry_iids = list()
+        iid_sep = self.iid_sep
+        lazy = self.lazy
+        hidden_parent = self._hidden_parent
+        rows = list()
+        add = rows.extend
+
+        def ended(pos):
+            if ends is not None and pos >= 0:
+                ends[pos] = len(preorder)
+
+        def position(iid):
+            if preorder is None:
+                return -1
+            preorder.append(iid)
+            if ends is not None:
+                ends.append(len(preorder))
+            return len(preorder) - 1
+
+        def register(struc, parent):
+            stack = [(parent, iter(struc), -1)]
+            while stack:
+                p, it, pos = stack[-1]
+                node = next(it, None)
+                if node is None:
+                    stack.pop()
+                    ended(pos)
+                    continue
+                iid = p + iid_sep + node[0]
+                hidden_parent[iid] = p
+                pos = position(iid)
+                if node[3]:
+                    sub_sector_iids.append(iid)
+                    if node[3] != (NOT_LOADED,):
+                        stack.append((iid, iter(node[3]), pos))
+                else:
+                    entry_iids.append(iid)
 
-        def make(struc, parent=""):
-            for _struc in struc:
-                if parent:
-                    iid = parent + iid_sep + _struc[0]
+        stack = [(parent, iter(structure), index, -1)]
+        while stack:
+            parent, it, index, pos = stack[-1]
+            _struc = next(it, None)
+            if _struc is None:
+                stack.pop()
+                ended(pos)
+                continue
+            if index != "end":
+                stack[-1] = (parent, it, index + 1, pos)
+            if parent:
+                iid = parent + iid_sep + _struc[0]
+            else:
+                iid = _struc[0]
+            if materialize:
+                del hidden_parent[iid]
+            pos = position(iid)
+            checked = _struc[4] if check is None else check
+            if _struc[3]:
+                if not parent:
+                    top_sector_iids.append(iid)
+                    tags = (TagsConfig.t_sector, TagsConfig.t_top_sector)
                 else:
-                    iid = _struc[0]
-                if _struc[3]:
-                    if not parent:
-                        top_sector_iids.append(iid)
-                        tags = (TagsConfig.t_sector, TagsConfig.t_top_sector)
-                    else:
-                        sub_sector_iids.append(iid)
-                        tags = (TagsConfig.t_sector, TagsConfig.t_sub_sector)
-                    if _struc[4]:
-                        tags += (TagsConfig.c_check_sector,)
-                    else:
-                        tags += (TagsConfig.c_uncheck_sector,)
-                    self.insert(parent, text=_struc[1], values=_struc[2], index="end", iid=iid, tags=tags, open=_struc[5])
-                    make(_struc[3], iid)
+                    sub_sector_iids.append(iid)
+                    tags = (TagsConfig.t_sector, TagsConfig.t_sub_sector)
+                if checked:
+                    tags += (TagsConfig.c_check_sector,)
                 else:
-                    entry_iids.append(iid)
-                    if _struc[4]:
-                        tags = (TagsConfig.t_entry, TagsConfig.c_check_entry)
-                    else:
-                        tags = (TagsConfig.t_entry, TagsConfig.c_uncheck_entry)
-                    self.insert(parent, text=_struc[1], values=_struc[2], index="end", iid=iid, tags=tags, open=_struc[5])
+                    tags += (TagsConfig.c_uncheck_sector,)
+                if _struc[3] == (NOT_LOADED,):
+                    add((parent, index, iid, _struc[1], _struc[2], tags, False))
+                    add(self._placeholder_row(iid))
+                    self.unloaded.add(iid)
+                elif lazy and (closed or not _struc[5]):
+                    add((parent, index, iid, _struc[1], _struc[2], tags, False))
+                    add(self._placeholder_row(iid))
+                    self._deferred[iid] = _struc[3]
+                    if check is not None:
+                        self._deferred_check[iid] = check
+                    if closed:
+                        self._deferred_closed.add(iid)
+                    if not materialize:
+                        register(_struc[3], iid)
+                        ended(pos)
+                else:
+                    add((parent, index, iid, _struc[1], _struc[2], tags, _struc[5]))
+                    stack.append((iid, iter(_struc[3]), "end", pos))
+            else:
+                entry_iids.append(iid)
+                if checked:
+                    tags = (TagsConfig.t_entry, TagsConfig.c_check_entry)
+                else:
+                    tags = (TagsConfig.t_entry, TagsConfig.c_uncheck_entry)
+                add((parent, index, iid, _struc[1], _struc[2], tags, _struc[5]))
+
+        self._insert_rows(rows)
 
-        make(structure)
+        return top_sector_iids, sub_sector_iids, entry_iids
 
-        self.top_sector_iids = tuple(top_sector_iids)
-        self.sub_sector_iids = tuple(sub_sector_iids)
-        self.all_sector_iids = self.top_sector_iids + self.sub_sector_iids
-        self.entry_iids = tuple(entry_iids)
+    def _make_flat(
+            self,
+            flat: FlatStructure,
+            preorder: list[str] = None,
+            ends: list[int] = None,
+    ) -> tuple[list[str], list[str], list[str]]:
+        from .flatstruct import F_CHECKED, F_OPENED, F_SECTOR, F_NOT_LOADED
+
+        top_sector_iids = list()
+        sub_sector_iids = list()
+        entry_iids = list()
+        iid_sep = self.iid_sep
+        rows = list()
+        add = rows.extend
+        full_iids = list() if preorder is None else preorder
+        base = len(full_iids)
+        lazy = self.lazy
+        kids = dict()
+        open_nodes = list()
+
+        for i, (p, rel_iid, label, values, f) in enumerate(flat.rows()):
+            if p >= 0:
+                parent = full_iids[base + p]
+                iid = parent + iid_sep + rel_iid
+            else:
+                parent = ""
+                iid = rel_iid
+            full_iids.append(iid)
+            if ends is not None:
+                while open_nodes and open_nodes[-1] != p:
+                    ends[base + open_nodes.pop()] = base + i
+                open_nodes.append(i)
+                ends.append(base + i + 1)
+            if f & F_SECTOR:
+                if p < 0:
+                    top_sector_iids.append(iid)
+                    tags = (TagsConfig.t_sector, TagsConfig.t_top_sector)
+                else:
+                    sub_sector_iids.append(iid)
+                    tags = (TagsConfig.t_sector, TagsConfig.t_sub_sector)
+                tags += (TagsConfig.c_check_sector if f & F_CHECKED else TagsConfig.c_uncheck_sector,)
+            else:
+                entry_iids.append(iid)
+                tags = (TagsConfig.t_entry, TagsConfig.c_check_entry if f & F_CHECKED else TagsConfig.c_uncheck_entry)
+            if p in kids:
+                if f & F_NOT_LOADED:
+                    children = (NOT_LOADED,)
+                elif f & F_SECTOR:
+                    children = kids[i] = list()
+                else:
+                    children = ()
+                kids[p].append((rel_iid, label, values, children, bool(f & F_CHECKED), bool(f & F_OPENED)))
+                self._hidden_parent[iid] = parent
+                continue
+            if f & F_NOT_LOADED:
+                add((parent, "end", iid, label, values, tags, False))
+                add(self._placeholder_row(iid))
+                self.unloaded.add(iid)
+                continue
+            if lazy and f & F_SECTOR and not f & F_OPENED:
+                add((parent, "end", iid, label, values, tags, False))
+                add(self._placeholder_row(iid))
+                self._deferred[iid] = kids[i] = list()
+                continue
+            add((parent, "end", iid, label, values, tags, bool(f & F_OPENED)))
+        self._insert_rows(rows)
+        if ends is not None:
+            for i in open_nodes:
+                ends[base + i] = len(full_iids)
+
+        return top_sector_iids, sub_sector_iids, entry_iids
+
+    def add_records(self, records: Iterable[Record], last: bool = True):
+        """queue preorder `records`, inserted `stream_chunk` at a time; `last`: no more calls follow"""
+        self._record_queue.append(iter(records))
+        self.records_done = last
+        if self._record_job is None:
+            self._record_job = self.after(1, self._insert_records)
+
+    def _insert_records(self):
+        self._record_job = None
+        iid_sep = self.iid_sep
+        stack = self._record_stack
+        queue = self._record_queue
+        rows = list()
+        add = rows.extend
+        top_sector_iids = list()
+        sub_sector_iids = list()
+        entry_iids = list()
+        ends = self._preorder_ends
+        base = len(self._preorder)
+
+        def emit(held, sector):
+            iid, parent, label, values, checked = held
+            ends.append(base + len(rows) // 7 + 1)
+            if sector:
+                if parent:
+                    sub_sector_iids.append(iid)
+                    tags = (TagsConfig.t_sector, TagsConfig.t_sub_sector)
+                else:
+                    top_sector_iids.append(iid)
+                    tags = (TagsConfig.t_sector, TagsConfig.t_top_sector)
+                tags += (TagsConfig.c_check_sector if checked else TagsConfig.c_uncheck_sector,)
+            else:
+                entry_iids.append(iid)
+                tags = (TagsConfig.t_entry, TagsConfig.c_check_entry if checked else TagsConfig.c_uncheck_entry)
+            add((parent, "end", iid, label, values, tags, False))
+
+        held = self._record_held
+        error = None
+        n = self.stream_chunk
+        while queue and n and error is None:
+            taken = 0
+            for path, label, values, checked in islice(queue[0], n):
+                taken += 1
+                if isinstance(path, str):
+                    iid = path
+                    parent = path.rpartition(iid_sep)[0]
+                else:
+                    iid = iid_sep.join(path)
+                    parent = iid_sep.join(path[:-1])
+                if held is not None:
+                    if parent == held[0]:
+                        stack.append((parent, base + len(rows) // 7))
+                        emit(held, True)
+                    else:
+                        emit(held, False)
+                while stack and stack[-1][0] != parent:
+                    ends[stack.pop()[1]] = base + len(rows) // 7
+                if parent and not stack:
+                    error = ValueError("record %r doesn't follow its parent, records come in preorder" % (path,))
+                    held = None
+                    break
+                held = (iid, parent, label, values, checked)
+            if taken < n:
+                queue.popleft()
+            n -= taken
+        if error is not None:
+            queue.clear()
+            self.records_done = True
+        if not queue and self.records_done and held is not None:
+            emit(held, False)
+            held = None
+        for _, pos in stack:
+            ends[pos] = base + len(rows) // 7
+        if not queue and self.records_done:
+            stack.clear()
+        self._record_held = held
+
+        self._insert_rows(rows)
+        new = len(rows) // 7
+        if new:
+            self._top_sector_iids += top_sector_iids
+            self._sub_sector_iids += sub_sector_iids
+            self._entry_iids += entry_iids
+            iids = rows[2::7]
+            self._preorder += iids
+            if self._preorder_index is not None:
+                self._preorder_index.update(zip(iids, range(base, base + new)))
+            self._frozen.clear()
+            self.records_inserted += new
+        done = self.records_done and not queue and held is None
+        if self.on_records is not None:
+            self.on_records(self.records_inserted, done)
+        if queue:
+            self._record_job = self.after(1, self._insert_records)
+        if error is not None:
+            raise error
+
+    def _placeholder_row(self, iid: str) -> tuple:
+        placeholder = iid + self.iid_sep + TagsConfig.p_placeholder
+        self._placeholders.add(placeholder)
+        return iid, "end", placeholder, "…", "", (TagsConfig.p_placeholder,), False
+
+    def _insert_rows(self, rows: list):
+        t_tags = self._t_tags
+        c_tags = self._c_tags
+        open_items = self._open_items
+        parents = self._parent
+        children = self._children
+        for parent, index, iid in zip(rows[0::7], rows[1::7], rows[2::7]):
+            parents[iid] = parent
+            children[iid] = []
+            if index == "end":
+                children[parent].append(iid)
+            else:
+                # as Tk: before the first child at most
+                children[parent].insert(max(index, 0), iid)
+        # a nested None becomes "None" in Tcl
+        rows[4::7] = ["" if values is None else values for values in rows[4::7]]
+        for iid, tags, open_ in zip(rows[2::7], rows[5::7], rows[6::7]):
+            if tags[0] != TagsConfig.p_placeholder:
+                t_tags[iid] = tags[:-1]
+                c_tags[iid] = tags[-1]
+                if open_:
+                    open_items.add(iid)
+        if not self.batch_insert:
+            insert = self.insert
+            for i in range(0, len(rows), 7):
+                parent, index, iid, text, values, tags, open_ = rows[i:i + 7]
+                insert(parent, index, iid, text=text, values=values, tags=tags, open=open_)
+            return
+        if not self.tk.call("info", "procs", _INSERT_PROC):
+            self.tk.eval(_INSERT_SCRIPT)
+        step = 7 * _INSERT_BATCH
+        for i in range(0, len(rows), step):
+            self.tk.call(_INSERT_PROC, self._w, tuple(rows[i:i + step]))
+
+    def _delete(self, iid: str):
+        self.delete(iid)
+        self._children[self._parent.pop(iid)].remove(iid)
+        stack = self._children.pop(iid)
+        while stack:
+            child = stack.pop()
+            del self._parent[child]
+            stack += self._children.pop(child)
+
+    def _materialize(self, iid: str):
+        if (children := self._deferred.pop(iid, None)) is None:
+            return
+        placeholder = iid + self.iid_sep + TagsConfig.p_placeholder
+        self._placeholders.discard(placeholder)
+        self._delete(placeholder)
+        closed = iid in self._deferred_closed
+        self._deferred_closed.discard(iid)
+        self._make(children, iid, check=self._deferred_check.pop(iid, None), materialize=True, closed=closed)
+
+    def _materialize_to(self, iid: str):
+        path = list()
+        while iid in self._hidden_parent:
+            iid = self._hidden_parent[iid]
+            path.append(iid)
+        for sector in reversed(path):
+            self._materialize(sector)
+
+    def _materialize_below(self, iid: str = ""):
+        if iid in self._hidden_parent:
+            self._materialize_to(iid)
+        stack = [iid]
+        while stack and self._deferred:
+            iid = stack.pop()
+            self._materialize(iid)
+            stack += self._children[iid]
+
+    def _hidden_nodes(self, sector: str) -> Iterator[tuple[str, StructureNode]]:
+        iid_sep = self.iid_sep
+        stack = [(sector, iter(self._deferred[sector]))]
+        while stack:
+            p, it = stack[-1]
+            node = next(it, None)
+            if node is None:
+                stack.pop()
+                continue
+            iid = p + iid_sep + node[0]
+            yield iid, node
+            if node[3] and node[3] != (NOT_LOADED,):
+                stack.append((iid, iter(node[3])))
+
+    def _forget_hidden(self, sector: str) -> list[str]:
+        if sector not in self._deferred:
+            return []
+        iids = [iid for iid, _ in self._hidden_nodes(sector)]
+        for iid in iids:
+            del self._hidden_parent[iid]
+        del self._deferred[sector]
+        self._deferred_check.pop(sector, None)
+        self._deferred_closed.discard(sector)
+        return iids
+
+    def _opened(self, iid: str):
+        if iid in self._c_tags:
+            self._open_items.add(iid)
+        self._materialize(iid)
+        self._request_children(iid)
+
+    def _request_children(self, iid: str):
+        if iid in self.unloaded and iid not in self._requested and self.children_loader is not None:
+            self._requested.add(iid)
+            self.children_loader(iid)
+
+    def load_children(self, iid: str, nodes: Iterable[StructureNode] | None):
+        self._requested.discard(iid)
+        if iid not in self.unloaded:
+            return
+        placeholder = iid + self.iid_sep + TagsConfig.p_placeholder
+        if nodes is None:
+            # retried at the next opening
+            self.item(placeholder, text="(not available)")
+            return
+        self.unloaded.discard(iid)
+        self._placeholders.discard(placeholder)
+        checked = self.is_checked(iid)
+        self._delete(placeholder)
+        self.insert_nodes(iid, nodes)
+        if checked:
+            self.toggle_check(True, iid)
 
     def set_width(self, width: int, minwidth: int = None):
         if minwidth:
@@ -200,29 +589,44 @@ class SelectTree(ttk.Treeview):
             self.column("#0", width=width)
 
     def toggle_recursive_expand(self, iid: str = "", expand: bool = None) -> bool:
+        self._materialize_to(iid)
         if expand is None:
             if not iid:
                 expand = True
                 for sector in self.top_sector_iids:
-                    if self.item(sector, "open"):
+                    if sector in self._open_items:
                         expand = False
                         break
             else:
-                expand = not self.item(iid, "open")
-        for sector in self.all_sector_iids:
-            if sector.startswith(iid):
-                self.item(sector, open=expand)
+                expand = iid not in self._open_items
+        if expand:
+            self._materialize_below(iid)
+        if iid:
+            sectors = [sector for sector in [iid] + self.get_main_list(iid) if self.is_sector(sector)]
+        else:
+            sectors = [sector for sector in self.all_sector_iids if sector not in self._hidden_parent]
+        for sector in sectors:
+            self._set_open(sector, expand)
+        if not expand:
+            self._deferred_closed.update(sector for sector in sectors if sector in self._deferred)
+        if expand:
+            for sector in self.unloaded.intersection(sectors):
+                self._request_children(sector)
         return expand
 
     def expand_for_match(self):
-        def x(_iid=""):
-            for t in self.item(_iid, "tags"):
-                if t.startswith("m-"):
-                    self.item(_iid, open=True)
-            children = self.get_children(_iid)
-            for _iid in children:
-                x(_iid)
-        x()
+        for _iid in list(self._m_tags):
+            self._materialize(_iid)
+            self._set_open(_iid, True)
+
+    def _set_open(self, iid: str, open_: bool):
+        if (iid in self._open_items) == open_:
+            return
+        if open_:
+            self._open_items.add(iid)
+        else:
+            self._open_items.discard(iid)
+        self.item(iid, open=open_)
 
     def iid_by_event(self, event):
         return self.identify_row(event.y)
@@ -237,16 +641,12 @@ class SelectTree(ttk.Treeview):
 
     def get_main_list(self, parent_iid: str = ""):
         _list = list()
-
-        def add(_iid=parent_iid):
+        stack = list(reversed(self._children[parent_iid]))
+        while stack:
+            _iid = stack.pop()
             _list.append(_iid)
-            children = self.get_children(_iid)
-            for _iid in children:
-                _list.append(_iid)
-                add(_iid)
-
-        add()
-        return _list[1:]
+            stack += reversed(self._children[_iid])
+        return _list
 
     def get_next_match(
             self,
@@ -322,115 +722,110 @@ class SelectTree(ttk.Treeview):
             return e
 
     def get_matches(self, parent_iid: str = "", scip_hints: bool = True, scip_sectors: bool = False) -> list[ThreeItem]:
-        matches = list()
         if scip_sectors:
-            def find(_iid=parent_iid):
-                children = self.get_children(_iid)
-                for _iid in children:
-                    itm = self.get(_iid)
-                    if TagsConfig.m_match_entry in itm.tags:
-                        matches.append(itm)
-                    else:
-                        find(_iid)
+            wanted = (TagsConfig.m_match_entry,)
         elif scip_hints:
-            def find(_iid=parent_iid):
-                children = self.get_children(_iid)
-                for _iid in children:
-                    itm = self.get(_iid)
-                    if (
-                            TagsConfig.m_match_entry in itm.tags
-                            or TagsConfig.m_match_sector in itm.tags
-                            or TagsConfig.m_match_and_hint_sector in itm.tags
-                    ):
-                        matches.append(itm)
-                    find(_iid)
+            wanted = (TagsConfig.m_match_entry, TagsConfig.m_match_sector, TagsConfig.m_match_and_hint_sector)
         else:
-            def find(_iid=parent_iid):
-                children = self.get_children(_iid)
-                for _iid in children:
-                    itm = self.get(_iid)
-                    for t in itm.tags:
-                        if t.startswith("m-"):
-                            matches.append(itm)
-                    find(_iid)
-        find()
+            wanted = None
+        m_tags = self._m_tags
+        matches = list()
+        stack = list(reversed(self._children[parent_iid]))
+        while stack:
+            _iid = stack.pop()
+            if (tag := m_tags.get(_iid)) is not None and (wanted is None or tag in wanted):
+                matches.append(self.get(_iid))
+                if scip_sectors:
+                    continue
+            stack += reversed(self._children[_iid])
         return matches
 
+    def _tags(self, iid: str) -> tuple[str, ...]:
+        tags = self._t_tags[iid] + (self._c_tags[iid],)
+        if (m := self._m_tags.get(iid)) is not None:
+            tags += (m,)
+        return tags
+
     def _change_check_tag(self, iid: str, tag: str):
-        tags = set(self.item(iid, "tags"))
-        for t in tags:
-            if t.startswith("c-"):
-                tags.remove(t)
-                break
-        tags.add(tag)
-        self.item(iid, tags=tuple(tags))
+        if self._c_tags[iid] == tag:
+            return
+        self._c_tags[iid] = tag
+        self.item(iid, tags=self._tags(iid))
+        if self.event_sink is not None:
+            self.event_sink(("check", iid, _CHECK_STATES[tag]))
 
     def _reset_match_tag(self, iid: str):
-        tags = set(self.item(iid, "tags"))
-        for t in tags:
-            if t.startswith("m-"):
-                tags.remove(t)
-                break
-        self.item(iid, tags=tuple(tags))
+        if self._m_tags.pop(iid, None) is not None:
+            self.item(iid, tags=self._tags(iid))
 
     def _add_match_tag(self, iid: str, tag: str):
-        tags = set(self.item(iid, "tags"))
-        for t in tags:
-            if t.startswith("m-"):
-                tag = "m-%s%s" % (
-                    str(int(t[2]) | int(tag[2])),
-                    t[3:]
-                )
-                tags.remove(t)
-                break
-
-        tags.add(tag)
-        self.item(iid, tags=tuple(tags))
+        if (t := self._m_tags.get(iid)) is not None:
+            tag = "m-%s%s" % (
+                str(int(t[2]) | int(tag[2])),
+                t[3:]
+            )
+            if tag == t:
+                return
+        self._m_tags[iid] = tag
+        self.item(iid, tags=self._tags(iid))
 
     def remove_match_tags(self, parent_iid: str = ""):
-        def rm(_iid=parent_iid):
-            children = self.get_children(_iid)
-            for _iid in children:
-                self._reset_match_tag(_iid)
-                rm(_iid)
-        rm()
+        if parent_iid:
+            iids = [_iid for _iid in self.get_main_list(parent_iid) if _iid in self._m_tags]
+        else:
+            iids = list(self._m_tags)
+        for _iid in iids:
+            self._reset_match_tag(_iid)
 
     def search(self, pattern: str | Pattern, parent_iid: str = "") -> bool:
 
         self.remove_match_tags()
 
-        match = False
-
-        def _search(_iid=parent_iid):
-            nonlocal match
-            children = self.get_children(_iid)
-            for _iid in children:
-                if search(pattern, self.item(_iid, "text")):
-
-                    match = True
-
-                    if _iid in self.all_sector_iids:
-                        self._add_match_tag(_iid, TagsConfig.m_match_sector)
-                    else:
-                        self._add_match_tag(_iid, TagsConfig.m_match_entry)
-
-                    def parentref(__iid=_iid):
-                        parent = self.parent(__iid)
-                        if parent:
-                            self._add_match_tag(parent, TagsConfig.m_hint_sector)
-                            parentref(parent)
-
-                    parentref()
+        matches = list()
 
-                _search(_iid)
+        def found(_iid):
 
-        _search()
+            matches.append(_iid)
 
-        return match
+            if self.is_sector(_iid):
+                self._add_match_tag(_iid, TagsConfig.m_match_sector)
+            else:
+                self._add_match_tag(_iid, TagsConfig.m_match_entry)
+
+            parent = self._parent[_iid]
+            while parent:
+                self._add_match_tag(parent, TagsConfig.m_hint_sector)
+                parent = self._parent[parent]
+
+        self._materialize_to(parent_iid)
+        stack = [(parent_iid, False)]
+        while stack:
+            _iid, match = stack.pop()
+            if match and search(pattern, self.item(_iid, "text")):
+                found(_iid)
+            if _iid in self._deferred:
+                for iid in [iid for iid, node in self._hidden_nodes(_iid) if search(pattern, node[1])]:
+                    self._materialize_to(iid)
+                    found(iid)
+                continue
+            stack += ((c, True) for c in reversed(self._children[_iid]) if c not in self._placeholders)
+
+        if self.event_sink is not None:
+            self.event_sink(("search", getattr(pattern, "pattern", pattern), tuple(matches)))
+
+        return bool(matches)
+
+    def clear_search(self):
+        self.remove_match_tags()
+        if self.event_sink is not None:
+            self.event_sink(("search", "", ()))
 
     def toggle_check(self, check: bool = None, iid: str = "") -> bool:
+        if iid in self._placeholders:
+            return bool(check)
+        self._materialize_to(iid)
         if iid:
-            if iid in self.all_sector_iids:
+            if self.is_sector(iid):
                 tag_check = TagsConfig.c_check_sector
                 tag_uncheck = TagsConfig.c_uncheck_sector
             else:
@@ -438,7 +833,7 @@ class SelectTree(ttk.Treeview):
                 tag_uncheck = TagsConfig.c_uncheck_entry
 
             if check is None:
-                check = tag_check not in self.item(iid, "tags")
+                check = self._c_tags[iid] != tag_check
 
             if check:
                 tag = tag_check
@@ -447,26 +842,13 @@ class SelectTree(ttk.Treeview):
 
             self._change_check_tag(iid, tag)
 
-            # self.toggle_parent_check(check, iid)
-
-            def __toggle(_iid, _tag):
-                self._change_check_tag(_iid, _tag)
-                parent = self.parent(_iid)
-                if parent:
-                    children = self.get_children(parent)
-                    states = set((TagsConfig.c_check_entry in (i := self.item(c, "tags")) or TagsConfig.c_check_sector in i or TagsConfig.c_cstate_sector in i) for c in children)
-                    if all(states):
-                        _tag = TagsConfig.c_check_sector
-                    elif len(states) == 1:
-                        _tag = TagsConfig.c_uncheck_sector
-                    else:
-                        _tag = TagsConfig.c_cstate_sector
-                    __toggle(parent, _tag)
-
-            __toggle(iid, tag)
+            parent = self._parent[iid]
+            while parent:
+                self._change_check_tag(parent, self._sector_check_tag(parent))
+                parent = self._parent[parent]
 
         elif check is None:
-            check = not all((TagsConfig.c_check_sector in self.item(c, "tags")) for c in self.get_children(iid))
+            check = not all(self._c_tags[c] == TagsConfig.c_check_sector for c in self._children[iid])
 
         if check:
             tag_entry = TagsConfig.c_check_entry
@@ -475,21 +857,87 @@ class SelectTree(ttk.Treeview):
             tag_entry = TagsConfig.c_uncheck_entry
             tag_sector = TagsConfig.c_uncheck_sector
 
-        # self.toggle_children_check(check, iid)
-
-        def __toggle(_iid):
-            children = self.get_children(_iid)
-            for _iid in children:
-                if _iid in self.all_sector_iids:
+        below = self._preorder_below(iid)
+        if below is not None:
+            if iid in self._deferred:
+                self._deferred_check[iid] = check
+            self._check_range(below, check)
+            return check
+
+        stack = [(iid, False)]
+        while stack:
+            _iid, change = stack.pop()
+            if change:
+                if self.is_sector(_iid):
                     self._change_check_tag(_iid, tag_sector)
                 else:
                     self._change_check_tag(_iid, tag_entry)
-                __toggle(_iid)
-
-        __toggle(iid)
+            if _iid in self._deferred:
+                self._deferred_check[_iid] = check
+                continue
+            stack += ((c, True) for c in reversed(self._children[_iid]) if c not in self._placeholders)
 
         return check
 
+    def _preorder_below(self, iid: str) -> Sequence[str] | None:
+        if not self._preorder_tree:
+            return None
+        if not iid:
+            return self._preorder
+        if self._preorder_index is None:
+            self._preorder_index = {iid: i for i, iid in enumerate(self._preorder)}
+        if (i := self._preorder_index.get(iid)) is None:
+            return None
+        return self._preorder[i + 1:self._preorder_ends[i]]
+
+    def _check_range(self, iids: Sequence[str], check: bool):
+        hidden = self._hidden_parent
+        c_tags = self._c_tags
+        if check:
+            tag_entry, tag_sector = TagsConfig.c_check_entry, TagsConfig.c_check_sector
+        else:
+            tag_entry, tag_sector = TagsConfig.c_uncheck_entry, TagsConfig.c_uncheck_sector
+        # not inserted (lazy)
+        changed = [i for i in iids if i not in hidden and c_tags[i] != tag_entry and c_tags[i] != tag_sector]
+        for i in iids:
+            if i in self._deferred:
+                self._deferred_check[i] = check
+        t_tags = self._t_tags
+        entries = [i for i in changed if TagsConfig.t_sector not in t_tags[i]]
+        changed_sectors = [i for i in changed if TagsConfig.t_sector in t_tags[i]]
+        for tags, tag, items in (
+                ((TagsConfig.c_check_entry, TagsConfig.c_uncheck_entry), tag_entry, entries),
+                ((TagsConfig.c_check_sector, TagsConfig.c_uncheck_sector, TagsConfig.c_cstate_sector), tag_sector, changed_sectors),
+        ):
+            c_tags.update(dict.fromkeys(items, tag))
+            for t in tags:
+                if t != tag:
+                    self.tag_remove(t, items)
+            self.tag_add(tag, items)
+        if self.event_sink is not None:
+            for i in changed:
+                self.event_sink(("check", i, check))
+
+    def tag_add(self, tag: str, items: Sequence[str]):
+        if items:
+            self.tk.call(self._w, "tag", "add", tag, tuple(items))
+
+    def tag_remove(self, tag: str, items: Sequence[str]):
+        if items:
+            self.tk.call(self._w, "tag", "remove", tag, tuple(items))
+
+    def _sector_check_tag(self, iid: str) -> str:
+        if iid in self.unloaded or iid in self._deferred:
+            return self._c_tags[iid]
+        c_tags = self._c_tags
+        states = set(c_tags[c] in (TagsConfig.c_check_entry, TagsConfig.c_check_sector, TagsConfig.c_cstate_sector) for c in self._children[iid])
+        if all(states):
+            return TagsConfig.c_check_sector
+        elif len(states) == 1:
+            return TagsConfig.c_uncheck_sector
+        else:
+            return TagsConfig.c_cstate_sector
+
     def toggle_single_check(self, check: bool = None, iid: str = "") -> bool:
         if check is None:
             check = not self.is_checked(iid)
@@ -497,34 +945,190 @@ class SelectTree(ttk.Treeview):
         self.toggle_check(check, iid)
         return check
 
+    def is_sector(self, iid: str) -> bool:
+        return TagsConfig.t_sector in self._t_tags.get(iid, ())
+
     def is_checked(self, iid: str) -> bool:
-        tags = self.item(iid, "tags")
-        return TagsConfig.c_check_entry in tags or TagsConfig.c_check_sector in tags
+        self._materialize_to(iid)
+        return self._c_tags.get(iid) in (TagsConfig.c_check_entry, TagsConfig.c_check_sector)
 
     def get(self, iid: str) -> ThreeItem:
+        # only text, image and values are read from Tk (as Tk converts them)
         item = self.item(iid)
-        tags = item["tags"]
-        return ThreeItem(iid, **item, is_sector=TagsConfig.t_sector in tags)
+        return ThreeItem(
+            iid, item["text"], item["image"], item["values"], iid in self._open_items, self._tags(iid),
+            TagsConfig.t_sector in self._t_tags[iid],
+        )
 
     def get_checked(self) -> list[ThreeItem]:
+        return [self.get(iid) for iid in self.get_checked_iids()]
+
+    def get_checked_iids(self) -> list[str]:
+        c_tags = self._c_tags
         checked = list()
+        stack = list(reversed(self._children[""]))
+        while stack:
+            iid = stack.pop()
+            tag = c_tags[iid]
+            if tag == TagsConfig.c_check_entry or tag == TagsConfig.c_check_sector:
+                checked.append(iid)
+            elif tag == TagsConfig.c_cstate_sector:
+                self._materialize(iid)
+                stack += reversed(self._children[iid])
+        return checked
 
-        def get(iid):
-            nonlocal checked
-            item = self.item(iid)
-            tags = item["tags"]
-            if TagsConfig.c_check_entry in tags:
-                checked.append(ThreeItem(iid, **item, is_sector=False))
-            elif TagsConfig.c_check_sector in tags:
-                checked.append(ThreeItem(iid, **item, is_sector=True))
-            elif TagsConfig.c_cstate_sector in tags:
-                for child in self.get_children(iid):
-                    get(child)
-
-        for sector in self.get_children(""):
-            get(sector)
+    def check_states(self) -> bytearray:
+        """0 unchecked, 1 checked, 2 cstate by `structure_preorder` position"""
+        if self._preorder_index is None:
+            self._preorder_index = {iid: i for i, iid in enumerate(self._preorder)}
+        index = self._preorder_index
+        states = bytearray(len(index))
+        for iid, tag in self._c_tags.items():
+            if (i := index.get(iid)) is not None:
+                states[i] = _CHECK_CODES[tag]
+        for sector in self._deferred:
+            check = self._deferred_check.get(sector)
+            for iid, node in self._hidden_nodes(sector):
+                if (i := index.get(iid)) is not None:
+                    states[i] = node[4] if check is None else check
+        return states
+
+    def _check_from(self, iid: str):
+        while iid:
+            if self._children[iid]:
+                self._change_check_tag(iid, self._sector_check_tag(iid))
+            iid = self._parent[iid]
+
+    def _update_iids(self, top: Iterable[str] = (), sub: Iterable[str] = (), entry: Iterable[str] = (), removed: Iterable[str] = ()):
+        top, sub, entry = tuple(top), tuple(sub), tuple(entry)
+        removed = set(removed).union(top, sub, entry)
+        self._top_sector_iids = [i for i in self._top_sector_iids if i not in removed] + list(top)
+        self._sub_sector_iids = [i for i in self._sub_sector_iids if i not in removed] + list(sub)
+        self._entry_iids = [i for i in self._entry_iids if i not in removed] + list(entry)
+        self._frozen.clear()
+
+    def _retype(self, iid: str):
+        tag = self._c_tags[iid]
+        checked = tag == TagsConfig.c_check_entry or tag == TagsConfig.c_check_sector
+        if self._children[iid]:
+            if tag == TagsConfig.c_cstate_sector:
+                self._c_tags[iid] = TagsConfig.c_cstate_sector
+            elif checked:
+                self._c_tags[iid] = TagsConfig.c_check_sector
+            else:
+                self._c_tags[iid] = TagsConfig.c_uncheck_sector
+            if self._parent[iid]:
+                self._update_iids(sub=(iid,))
+                self._t_tags[iid] = (TagsConfig.t_sector, TagsConfig.t_sub_sector)
+            else:
+                self._update_iids(top=(iid,))
+                self._t_tags[iid] = (TagsConfig.t_sector, TagsConfig.t_top_sector)
+        else:
+            self._update_iids(entry=(iid,))
+            self._t_tags[iid] = (TagsConfig.t_entry,)
+            self._c_tags[iid] = TagsConfig.c_check_entry if checked else TagsConfig.c_uncheck_entry
+        self.item(iid, tags=self._tags(iid))
+
+    def _row_index(self, iid: str) -> int:
+        n = 0
+        while iid:
+            parent = self._parent[iid]
+            for sibling in self._children[parent]:
+                if sibling == iid:
+                    break
+                n += 1 + self._displayed_below(sibling)
+            if parent:
+                n += 1
+            iid = parent
+        return n
+
+    def _displayed_below(self, iid: str) -> int:
+        n = 0
+        stack = [iid]
+        while stack:
+            iid = stack.pop()
+            if not iid or iid in self._open_items:
+                children = self._children[iid]
+                n += len(children)
+                stack += children
+        return n
+
+    def scroll_to_row(self, iid: str):
+        if total := self._displayed_below(""):
+            self.yview_moveto(self._row_index(iid) / total)
+
+    def insert_nodes(self, parent_iid: str, nodes: Iterable[StructureNode], index: int | str = "end") -> None:
+        self._materialize_to(parent_iid)
+        self._materialize(parent_iid)
+        self._preorder_tree = False
+        self._update_iids(*self._make(nodes, parent_iid, index))
+        if parent_iid:
+            self._retype(parent_iid)
+            self._check_from(parent_iid)
+
+    def delete_nodes(self, iids: Iterable[str]) -> None:
+        removed = list()
+        parents = set()
+        self._preorder_tree = False
+        for iid in iids:
+            self._materialize_to(iid)
+            if iid in self._parent:
+                parents.add(self._parent[iid])
+                below = [iid] + self.get_main_list(iid)
+                removed += below
+                for item in below:
+                    self._t_tags.pop(item, None)
+                    self._c_tags.pop(item, None)
+                    self._m_tags.pop(item, None)
+                    self._open_items.discard(item)
+                for sector in below:
+                    removed += self._forget_hidden(sector)
+                self._delete(iid)
+        self._update_iids(removed=removed)
+        self.unloaded.difference_update(removed)
+        self._placeholders.difference_update(removed)
+        for parent in parents:
+            if parent and parent in self._parent:
+                self._retype(parent)
+                self._check_from(parent)
+
+    def move_node(self, iid: str, parent_iid: str, index: int | str = "end") -> None:
+        self._materialize_to(iid)
+        self._materialize_to(parent_iid)
+        self._materialize(parent_iid)
+        old_parent = self._parent[iid]
+        self._preorder_tree = False
+        self.move(iid, parent_iid, index)
+        self._children[old_parent].remove(iid)
+        self._children[parent_iid] = list(self.get_children(parent_iid))
+        self._parent[iid] = parent_iid
+        self._retype(iid)
+        for parent in (old_parent, parent_iid):
+            if parent:
+                self._retype(parent)
+                self._check_from(parent)
+
+    def relabel_node(self, iid: str, text: str, values: Any = None) -> None:
+        self._materialize_to(iid)
+        if values is None:
+            self.item(iid, text=text)
+        else:
+            self.item(iid, text=text, values=values)
 
-        return checked
+    _PATCH_OPS = {
+        "insert": insert_nodes,
+        "delete": delete_nodes,
+        "move": move_node,
+        "relabel": relabel_node,
+    }
+
+    def apply_patch(self, patch: tuple):
+        """("insert", parent_iid, nodes, index) | ("delete", iids) | ("move", iid, parent_iid, index) | ("relabel", iid, text, values)"""
+        op, *args = patch
+        anchor = self.identify_row(1)
+        self._PATCH_OPS[op](self, *args)
+        if anchor and anchor in self._parent:
+            self.scroll_to_row(anchor)
 
 
 class SelectTreeWidget(ttk.Frame):
@@ -536,6 +1140,8 @@ class SelectTreeWidget(ttk.Frame):
     confirm_frame: ttk.Frame | None
     cancel_button: ttk.Button | None
     confirm_button: ttk.Button | None
+    progress_bar: ttk.Progressbar | None
+    records_total: int | None
 
     mode: Literal["multi", "single", "single entry", "single sector"]
 
@@ -561,15 +1167,23 @@ class SelectTreeWidget(ttk.Frame):
                 type_top_sector=dict(),
                 type_sub_sector=dict(),
             ),
-            ttk_styler: Callable[[ttk.Style], dict] | None = None
+            ttk_styler: Callable[[ttk.Style], dict] | None = None,
+            flat: FlatStructure | None = None,
+            phase_hook: Callable[[str], Any] | None = None,
+            lazy: bool = False,
+            records: Iterable[Record] | None = None,
+            records_total: int | None = None,
+            records_hook: Callable[[int, bool], Any] | None = None,
     ):
         ttk.Frame.__init__(self, master)
+        phase = phase_hook or (lambda name: None)
 
         self.widget_frame = ttk.Frame(self)
 
         self.mode = mode
 
-        _folder = str(Path(__file__).parent)
+        images = load_checkbox_images(self.widget_frame)
+        phase("images")
 
         self.tree = SelectTree(
             *structure,
@@ -578,14 +1192,22 @@ class SelectTreeWidget(ttk.Frame):
                 match_sector={'background': "#FFF84B", 'foreground': "black"},
                 match_hint_sector={'background': "#DCFF4B"},
                 match_hint_and_match_sector={'background': "#FFB84B"},
-                check_entry=dict(image=tk.PhotoImage(file=_folder + "/dat/checkbox_checked18.png", master=self.widget_frame)),
-                uncheck_entry=dict(image=tk.PhotoImage(file=_folder + "/dat/checkbox_unchecked18.png", master=self.widget_frame)),
-                check_sector=dict(image=tk.PhotoImage(file=_folder + "/dat/checkbox_checked18.png", master=self.widget_frame)),
-                uncheck_sector=dict(image=tk.PhotoImage(file=_folder + "/dat/checkbox_unchecked18.png", master=self.widget_frame)),
-                cstate_sector=dict(image=tk.PhotoImage(file=_folder + "/dat/checkbox_hover18.png", master=self.widget_frame)),
+                check_entry=dict(image=images["checked"]),
+                uncheck_entry=dict(image=images["unchecked"]),
+                check_sector=dict(image=images["checked"]),
+                uncheck_sector=dict(image=images["unchecked"]),
+                cstate_sector=dict(image=images["cstate"]),
             ) | tags_config_update,
-            master=self.widget_frame
+            master=self.widget_frame,
+            flat=flat,
+            lazy=lazy,
+            records=records,
         )
+        self.progress_bar = None
+        self.records_total = records_total
+        self._records_hook = records_hook
+        self.tree.on_records = self._records_progress
+        phase("tree")
         if self.mode == "multi":
 
             def check(e, iid=None):
@@ -606,29 +1228,29 @@ class SelectTreeWidget(ttk.Frame):
 
             def check(e, iid=None):
                 if iid:
-                    if iid not in self.tree.all_sector_iids:
+                    if not self.tree.is_sector(iid):
                         self.tree.toggle_single_check(iid=iid)
                 elif self.tree.event_points_to(e, "image"):
                     iid = self.tree.iid_by_event(e)
-                    if iid not in self.tree.all_sector_iids:
+                    if not self.tree.is_sector(iid):
                         self.tree.toggle_single_check(iid=iid)
 
         elif self.mode == "single sector":
 
             def check(e, iid=None):
                 if iid:
-                    if iid in self.tree.all_sector_iids:
+                    if self.tree.is_sector(iid):
                         self.tree.toggle_single_check(iid=iid)
                 elif self.tree.event_points_to(e, "image"):
                     iid = self.tree.iid_by_event(e)
-                    if iid in self.tree.all_sector_iids:
+                    if self.tree.is_sector(iid):
                         self.tree.toggle_single_check(iid=iid)
 
         else:
             raise ValueError(self.mode)
 
         self.tree.bind("<Button-1>", check, add=True)
-        self.tree.bind("<Double-Button-1>", lambda e: (check(e, iid) if (iid := self.tree.iid_by_selected()) not in self.tree.all_sector_iids else None))
+        self.tree.bind("<Double-Button-1>", lambda e: (check(e, iid) if not self.tree.is_sector(iid := self.tree.iid_by_selected()) else None))
         self.tree.bind("<Double-Right>", lambda e: self.tree.toggle_recursive_expand(self.tree.iid_by_selected(), True))
         self.tree.bind("<Double-Left>", lambda e: self.tree.toggle_recursive_expand(self.tree.iid_by_selected(), False))
         self.tree.bind("+", lambda e: self.tree.toggle_recursive_expand(self.tree.iid_by_selected(), True))
@@ -652,11 +1274,11 @@ class SelectTreeWidget(ttk.Frame):
                     self.tree.toggle_recursive_expand(expand=False)
                     self.tree.expand_for_match()
             else:
-                self.tree.remove_match_tags()
+                self.tree.clear_search()
 
         def delete(e):
             self.search_entry.delete(0, 9_999_999)
-            self.tree.remove_match_tags()
+            self.tree.clear_search()
 
         self.search_entry.bind("<Return>", _search)
         self.search_entry.bind("<Control-BackSpace>", delete)
@@ -720,20 +1342,38 @@ class SelectTreeWidget(ttk.Frame):
             self.confirm_button = None
 
         for iid in checked_iids:
-            if isinstance(iid, StructureNode):
-                for _iid in iid.child_iter():
-                    self.tree.toggle_check(True, _iid)
-            else:
-                self.tree.toggle_check(True, iid)
+            self.tree.toggle_check(True, iid[0] if isinstance(iid, StructureNode) else iid)
 
         self.expand_button.configure(style="expand.TButton")
         self.cancel_button.configure(style="cancel.TButton")
         self.confirm_button.configure(style="confirm.TButton")
         self.tree.configure(style="select.Treeview")
 
+        phase("widgets")
+
         if ttk_styler is not None:
             gl = globals()
             gl |= {"." + k: v for k, v in ttk_styler(ttk.Style()).items()}
+            phase("styler")
+
+    def _records_progress(self, inserted: int, done: bool):
+        if done:
+            if self.progress_bar is not None:
+                self.progress_bar.grid_remove()
+        else:
+            if self.progress_bar is None:
+                self.progress_bar = ttk.Progressbar(
+                    self.widget_frame,
+                    mode="determinate" if self.records_total else "indeterminate",
+                    maximum=self.records_total or 100,
+                )
+                self.progress_bar.grid(row=2, column=0, columnspan=2, sticky=tk.NSEW)
+            if self.records_total:
+                self.progress_bar.configure(value=inserted)
+            else:
+                self.progress_bar.step()
+        if self._records_hook is not None:
+            self._records_hook(inserted, done)
 
     def resize(self, height: int, width: int) -> bool:
         """returns whether Tk-sizing is ready"""
@@ -751,3 +1391,62 @@ class SelectTreeWidget(ttk.Frame):
         self.tree.configure(height=height - entry_height)
         return True
 
+
+
+if __name__ == '__main__':
+    # python -m v2.base.treeselect [nodes ...]
+    # python -m v2.base.treeselect deep [levels]
+    from sys import argv, getrecursionlimit
+    from time import perf_counter
+
+    root = tk.Tk()
+    root.withdraw()
+
+    if argv[1:2] == ["deep"]:
+        levels = int(argv[2]) if len(argv) > 2 else 10_000
+        node = StructureNode("leaf", "leaf")
+        for level in range(levels - 1, -1, -1):
+            node = StructureNode("L%i" % level, "level %i" % level, StructureNode("E%i" % level, "entry %i" % level), node)
+        print("%i levels, %i nodes (recursion limit %i)" % (levels, 2 * levels + 1, getrecursionlimit()))
+        t = perf_counter()
+        tree = SelectTree(node, tags_config=TagsConfig(), master=root)
+        print("%-20s %10.1f ms" % ("build", (perf_counter() - t) * 1e3))
+        leaf = "L0" + "".join(".L%i" % level for level in range(1, levels)) + ".leaf"
+        for name, f in (
+                ("child_iter", lambda: sum(1 for _ in node.child_iter())),
+                ("get_main_list", tree.get_main_list),
+                ("search", lambda: tree.search(compile("leaf|entry 1$"))),
+                ("expand_for_match", tree.expand_for_match),
+                ("get_matches", lambda: tree.get_matches(scip_hints=False)),
+                ("remove_match_tags", tree.remove_match_tags),
+                ("toggle_check top", lambda: tree.toggle_check(True, "L0")),
+                ("toggle_check leaf", lambda: tree.toggle_check(False, leaf)),
+                ("get_checked", tree.get_checked),
+                ("get_checked_iids", tree.get_checked_iids),
+        ):
+            t = perf_counter()
+            f()
+            print("%-20s %10.1f ms" % (name, (perf_counter() - t) * 1e3))
+        root.destroy()
+        raise SystemExit
+
+    sizes = [int(a) for a in argv[1:]] or [1_000, 10_000, 100_000, 1_000_000]
+
+    print("%10s %18s %18s %8s" % ("nodes", "insert nodes/s", "batched nodes/s", "speedup"))
+    for size in sizes:
+        sectors = max(1, size // 100)
+        entries = size // sectors - 1
+        structure = tuple(
+            StructureNode("S%i" % s, "sector %i" % s, *(StructureNode("E%i" % e, ("entry", s, e)) for e in range(entries)))
+            for s in range(sectors)
+        )
+        nodes = sectors * (entries + 1)
+        rates = list()
+        for batch in (False, True):
+            SelectTree.batch_insert = batch
+            t = perf_counter()
+            tree = SelectTree(*structure, tags_config=TagsConfig(), master=root)
+            rates.append(nodes / (perf_counter() - t))
+            tree.destroy()
+        print("%10i %18.0f %18.0f %7.1fx" % (nodes, rates[0], rates[1], rates[1] / rates[0]))
+    root.destroy()
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from statistics import median
+from sys import argv
+from time import sleep
+
+from .base.server import TkBgServer, TkBgPool
+from .base.structure import StructureNode, TagsConfig
+from .treeselectpopup import _popup_make, _popup_warmup, __default_ttk_styler as _ttk_styler
+
+
+def _bench_make(*structure: StructureNode, server: TkBgServer, **kwargs):
+    # the popup closes itself once it is painted
+    root = _popup_make(*structure, server=server, **kwargs)
+
+    def painted():
+        if "first paint" in server.phases:
+            server.send(None)
+            server.exit()
+        else:
+            root.after(5, painted)
+
+    root.after(5, painted)
+    return root
+
+
+def bench(start_method: str | None, pool: TkBgPool | None, structure: tuple[StructureNode, ...], rounds: int) -> dict[str, float]:
+    phases = dict()
+    for _ in range(rounds):
+        if pool is not None:
+            while pool.ready() < pool.size:
+                sleep(0.05)
+        recv = TkBgServer(start_method=start_method, pool=pool)(_bench_make)(
+            *structure,
+            checked_iids=(),
+            check_mode="multi",
+            at_focus_out=None,
+            window_mode="top",
+            window_title="bench",
+            window_height=50,
+            window_width=30,
+            return_mode="receiver",
+            tags_config_update=TagsConfig(),
+            ttk_styler=_ttk_styler,
+            stream_events=False,
+            load_children=False,
+        )
+        recv.receive(True)
+        recv.close()
+        for phase, t in recv.metadata["phases"].items():
+            phases.setdefault(phase, list()).append(t)
+        for key in ("rss", "pss"):
+            if recv.metadata[key] is not None:
+                phases.setdefault(key, list()).append(recv.metadata[key])
+    return {phase: median(t) for phase, t in phases.items()}
+
+
+if __name__ == '__main__':
+    # python -m v2.startbench [rounds] [sectors] [MB of ballast in the main process]
+    rounds = int(argv[1]) if len(argv) > 1 else 10
+    sectors = int(argv[2]) if len(argv) > 2 else 100
+    ballast = [bytes(1 << 20) for _ in range(int(argv[3]) if len(argv) > 3 else 0)]
+    structure = tuple(
+        StructureNode("S%i" % s, "", *(StructureNode("E%i" % e, "") for e in range(10)))
+        for s in range(sectors)
+    )
+
+    shown = ("process", "connected", "root", "tree", "make", "first paint", "received")
+    print("%-20s" % "ms after request" + "".join("%12s" % p for p in shown) + "%10s%10s" % ("RSS MB", "PSS MB"))
+    for name, start_method, pool_args in (
+            ("fork", "fork", None),
+            ("spawn", "spawn", None),
+            ("forkserver", "forkserver", None),
+            ("bootstrap", "bootstrap", None),
+            ("pool (warm)", None, dict(size=1, warmup=_popup_warmup)),
+    ):
+        pool = TkBgPool(**pool_args) if pool_args is not None else None
+        try:
+            times = bench(start_method, pool, structure, rounds)
+        finally:
+            if pool is not None:
+                pool.close()
+        print("%-20s" % name + "".join("%12s" % ("%.1f" % (times[p] * 1e3) if p in times else "-") for p in shown)
+              + "".join("%10s" % ("%.1f" % (times[k] / 2 ** 20) if k in times else "-") for k in ("rss", "pss")))
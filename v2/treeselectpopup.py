@@ -1,22 +1,37 @@
 from __future__ import annotations
 
-from typing import Literal, Iterable, Callable
+from typing import Literal, Iterable, Callable, TYPE_CHECKING
 
-import tkinter.ttk as ttk
-from tkinter import font as tkFont
+from itertools import islice
+from threading import Thread
 
-from .base.popup import PopupRoot
-from .base.server import TkBgServer, TkBgReceiver
-from .base.treeselect import StructureNode, SelectTreeWidget, TagsConfig
+from .base.server import TkBgServer, TkBgReceiver, TkBgPool, AsyncTkBgReceiver, MSG_PATCH, MSG_LOAD, MSG_CHILDREN, MSG_RECORDS, FORKSERVER_PRELOAD
+from .base.transport import Transport
+from .base.resultcodec import ResultFormat, encode_result, decode_result
+from .base.structure import StructureNode, TagsConfig, Record
+
+if TYPE_CHECKING:
+    import tkinter.ttk as ttk
+    from concurrent.futures import Future
+    from .base.popup import PopupRoot
+    from .base.broker import TkBgBroker, TkBgBrokerClient
+    from .base.flatstruct import StructureHandoff
+
+
+FORKSERVER_PRELOAD.append(__name__)
+
+RECORDS_CHUNK = 2_000
 
 
 def __default_ttk_styler(style: ttk.Style):
+    from tkinter.font import Font
+
     style.configure(
         "select.Treeview",
         weight="normal",
         size=10
     )
-    __font = tkFont.Font()
+    __font = Font()
     __font.configure(underline=True, weight="bold", size=10)
     style.map('select.Treeview', font=[('selected', __font)], background=[], foreground=[('selected', '#000000')])
 
@@ -64,6 +79,232 @@ def __default_ttk_styler(style: ttk.Style):
     return locals()
 
 
+def _popup_warmup() -> PopupRoot:
+    from .base.popup import PopupRoot
+    from .base.treeselect import load_checkbox_images
+
+    root = PopupRoot()
+    root.withdraw()
+    load_checkbox_images(root)
+    return root
+
+
+def _popup_make(
+        *structure: StructureNode,
+        server: TkBgServer,
+        checked_iids: Iterable[StructureNode | str],
+        check_mode: Literal["multi", "single", "single entry", "single sector"],
+        at_focus_out: Literal["cancel", "confirm"] | None,
+        window_mode: Literal["dead", "headless", "fullscreen", "top"],
+        window_title: str,
+        window_height: int,
+        window_width: int,
+        return_mode: Literal["receiver", "receiver at action", "wait value", "instand value", "value at action"],
+        tags_config_update: TagsConfig,
+        ttk_styler: Callable[[ttk.Style], dict] | None,
+        stream_events: bool,
+        load_children: bool,
+        structure_handoff: StructureHandoff | None = None,
+        result_format: ResultFormat = "items",
+        result_fields: tuple[str, ...] = ("iid",),
+        lazy_tree: bool = False,
+        stream_records: bool = False,
+        records_total: int | None = None,
+) -> PopupRoot:
+    from .base.popup import PopupRoot
+    from .base.treeselect import SelectTreeWidget
+
+    if isinstance(server.warm, PopupRoot):
+        root = server.warm
+        root.setup(
+            window_mode=window_mode,
+            title=window_title
+        )
+        root.deiconify()
+    else:
+        root = PopupRoot(
+            window_mode=window_mode,
+            title=window_title
+        )
+    server.mark("root")
+    if root.window_mode == "fullscreen":
+        window_width, window_height = root.fullscreen_width, root.fullscreen_height
+
+    def records_progress(inserted: int, done: bool):
+        server.progress(dict(records=inserted, done=done))
+        if done:
+            server.mark("records")
+
+    widget = SelectTreeWidget(
+        root,
+        *structure,
+        mode=check_mode,
+        checked_iids=checked_iids,
+        tags_config_update=tags_config_update,
+        ttk_styler=ttk_styler,
+        flat=structure_handoff.open() if structure_handoff is not None else None,
+        phase_hook=server.mark,
+        lazy=lazy_tree,
+        records_total=records_total,
+        records_hook=records_progress if stream_records else None,
+    )
+    widget.pack()
+
+    if stream_records:
+        widget.tree.add_records((), last=False)
+        server.handlers[MSG_RECORDS] = lambda chunk: widget.tree.add_records(chunk or (), last=chunk is None)
+
+    if structure_handoff is not None:
+        structure_handoff.release()
+
+    if stream_events:
+        widget.tree.event_sink = server.send_event
+
+    server.handlers[MSG_PATCH] = widget.tree.apply_patch
+
+    if load_children:
+        widget.tree.children_loader = lambda iid: server.send_message(MSG_LOAD, iid)
+        server.handlers[MSG_CHILDREN] = lambda obj: widget.tree.load_children(*obj)
+
+    def sizing(e):
+        if not widget.resize(window_height, window_width):
+            return
+
+        root.resize(window_height, window_width)
+        server.mark("sized")
+
+        children = widget.tree.get_children()
+        if children:
+            widget.tree.selection_set(children[0])
+            widget.tree.focus_set()
+            widget.tree.focus(children[0])
+
+        root.unbind(sizing_b)
+
+    sizing_b = root.bind("<Configure>", sizing)
+
+    # after the idle time redraw
+    def first_paint(e):
+        root.after_idle(server.mark, "first paint")
+        widget.tree.unbind("<Expose>", first_paint_b)
+
+    first_paint_b = widget.tree.bind("<Expose>", first_paint, add=True)
+
+    def first_interaction(e):
+        server.mark("first interaction")
+
+    root.bind_all("<KeyPress>", first_interaction, add=True)
+    root.bind_all("<ButtonPress>", first_interaction, add=True)
+
+    def checked(items: list | None = None) -> object:
+        if items is None:
+            if result_format in ("iids", "packed"):
+                items = widget.tree.get_checked_iids()
+            elif result_format == "bitmap":
+                items = widget.tree.check_states()
+            else:
+                items = widget.tree.get_checked()
+        return encode_result(items, result_format, result_fields)
+
+    def fin(obj):
+        server.send(obj)
+        server.exit()
+
+    def cancel(e):
+        fin(None)
+
+    widget.cancel_button.bind("<Button-1>", cancel)
+    widget.cancel_button.bind("<Return>", cancel)
+    widget.cancel_button.bind("<space>", cancel)
+    root.bind("<Escape>", cancel)
+    root.bind("<Control-c>", cancel)
+
+    def confirm(e):
+        fin(checked())
+
+    widget.confirm_button.bind("<Button-1>", confirm)
+    widget.confirm_button.bind("<Return>", confirm)
+    widget.confirm_button.bind("<space>", confirm)
+    root.bind("<Control-Return>", confirm)
+
+    if at_focus_out:
+        if at_focus_out == "confirm":
+            root.bind("<FocusOut>", lambda e: (confirm(None) if e.widget == root else None))
+        else:
+            root.bind("<FocusOut>", lambda e: (cancel(None) if e.widget == root else None))
+
+    if return_mode in ("value at action", "receiver at action"):
+
+        def single_return(e):
+            if c := widget.tree.get_checked_iids():
+                fin(checked(c if result_format in ("iids", "packed") else None))
+            else:
+                fin(None)
+
+        widget.tree.bind("<Return>", single_return, add=True)
+        widget.tree.bind("<space>", single_return, add=True)
+        widget.tree.bind("<Button-1>", single_return, add=True)
+        widget.tree.bind("<Double-Button-1>", single_return, add=True)
+        widget.tree.bind("#", single_return, add=True)
+
+    return root
+
+
+def _feed_records(recv: TkBgReceiver, records: Iterable[Record]):
+    records = iter(records)
+    try:
+        while chunk := tuple(islice(records, RECORDS_CHUNK)):
+            recv.send(MSG_RECORDS, chunk)
+        recv.send(MSG_RECORDS, None)
+    except (OSError, ValueError):
+        pass
+
+
+def _close_at_exit(recv: TkBgReceiver):
+    if hasattr(recv.process, "join"):
+        recv.process.join()
+    else:
+        recv.process.wait()
+    recv.close()
+
+
+def popup_pool(size: int = 2, daemon: bool = True) -> TkBgPool:
+    """warm processes for `popup(..., server_pool=...)`"""
+    return TkBgPool(size=size, warmup=_popup_warmup, daemon=daemon)
+
+
+def popup_broker(concurrency: int = 4, queue_size: int = 16, pool_size: int = 0, **broker_kwargs) -> TkBgBroker:
+    """started broker for `popup(..., server_broker=broker.client())`"""
+    from .base.broker import TkBgBroker
+
+    return TkBgBroker(
+        concurrency=concurrency,
+        queue_size=queue_size,
+        pool_size=pool_size,
+        warmup=_popup_warmup,
+        **broker_kwargs
+    ).start()
+
+
+def _decoded(future: Future, result_format: ResultFormat) -> Future:
+    from concurrent.futures import Future
+
+    decoded = Future()
+
+    def done(f: Future):
+        if f.cancelled():
+            decoded.cancel()
+        elif f.exception() is not None:
+            decoded.set_exception(f.exception())
+        else:
+            decoded.metadata = getattr(f, "metadata", None)
+            decoded.set_result(decode_result(f.result(), result_format))
+
+    future.add_done_callback(done)
+    decoded.add_done_callback(lambda f: future.cancel() if f.cancelled() else None)
+    return decoded
+
+
 def popup(
         *structure: StructureNode,
         checked_iids: Iterable[StructureNode | str] = (),
@@ -79,104 +320,164 @@ def popup(
         window_height: int = 70,
         window_width: int = 50,
         server_address: str = "127.0.0.11",
-        server_port: int = 50_000,
+        server_port: int = 0,
+        server_transport: Literal["tcp", "unix", "socketpair", "pipe"] | Callable[[], Transport] = "tcp",
         server_daemon: bool = True,
+        server_start_method: Literal["fork", "spawn", "forkserver", "bootstrap"] | None = None,
+        server_pool: TkBgPool | None = None,
+        server_broker: TkBgBrokerClient | None = None,
+        server_heartbeat: float | None = None,
+        structure_handoff: Literal["pickle", "shm", "mmap"] = "pickle",
+        result_format: ResultFormat = "items",
+        result_fields: tuple[str, ...] = ("iid",),
         return_mode: Literal[
             "receiver",
+            "receiver at action",
             "wait value",
             "instand value",
             "value at action"
         ] = "wait value",
         tags_config_update: TagsConfig = TagsConfig(),
-        ttk_styler: Callable[[ttk.Style], dict] | None = __default_ttk_styler
-) -> TkBgReceiver | object:
-
-    @TkBgServer(
-        address=server_address,
-        port=server_port,
-        daemon=server_daemon,
-        instand_return=return_mode in ("wait value", "instand value", "value at action"),
-        instand_return_blocking=return_mode in ("wait value", "value at action"),
-    )
-    def func(server: TkBgServer, window_width=window_width, window_height=window_height):
+        ttk_styler: Callable[[ttk.Style], dict] | None = __default_ttk_styler,
+        stream_events: bool = False,
+        child_provider: Callable[[str], Iterable[StructureNode]] | None = None,
+        lazy_tree: bool = False,
+        records: Iterable[Record] | None = None,
+        records_total: int | None = None,
+) -> TkBgReceiver | Future | object:
+    """
+    `records`: flat (path, label, values, checked) records in preorder, inserted behind `structure`.
+    `child_provider(iid)`: the children of a NOT_LOADED sector, called in the main process.
+    `server_broker`: the "receiver" return modes give a `Future` of the value instead of a `TkBgReceiver`.
+    `result_format`: see `resultcodec`.
+    """
+    if structure_handoff != "pickle":
+        from .base.flatstruct import StructureHandoff
 
-        root = PopupRoot(
-            window_mode=window_mode,
-            title=window_title
-        )
-        if root.window_mode == "fullscreen":
-            window_width, window_height = root.fullscreen_width, root.fullscreen_height
+        handoff = StructureHandoff(structure, structure_handoff)
+        structure = ()
+    else:
+        handoff = None
 
-        widget = SelectTreeWidget(
-            root,
+    if server_broker is not None:
+        if stream_events or child_provider is not None or records is not None:
+            raise ValueError("stream_events, child_provider and records need a direct connection, not a broker")
+        future = server_broker.submit(
+            _popup_make,
             *structure,
-            mode=check_mode,
             checked_iids=checked_iids,
+            check_mode=check_mode,
+            at_focus_out=at_focus_out,
+            window_mode=window_mode,
+            window_title=window_title,
+            window_height=window_height,
+            window_width=window_width,
+            return_mode=return_mode,
             tags_config_update=tags_config_update,
-            ttk_styler=ttk_styler
+            ttk_styler=ttk_styler,
+            stream_events=False,
+            load_children=False,
+            structure_handoff=handoff,
+            result_format=result_format,
+            result_fields=result_fields,
+            lazy_tree=lazy_tree,
         )
-        widget.pack()
-
-        def sizing(e):
-            if not widget.resize(window_height, window_width):
-                return
-
-            root.resize(window_height, window_width)
-
-            children = widget.tree.get_children()
-            if children:
-                widget.tree.selection_set(children[0])
-                widget.tree.focus_set()
-                widget.tree.focus(children[0])
-
-            root.unbind(sizing_b)
-
-        sizing_b = root.bind("<Configure>", sizing)
-
-        def fin(obj):
-            server.send(obj)
-            server.exit()
-
-        def cancel(e):
-            fin(None)
-
-        widget.cancel_button.bind("<Button-1>", cancel)
-        widget.cancel_button.bind("<Return>", cancel)
-        widget.cancel_button.bind("<space>", cancel)
-        root.bind("<Escape>", cancel)
-        root.bind("<Control-c>", cancel)
+        if handoff is not None:
+            future.add_done_callback(lambda f: handoff.release())
+        if result_format in ("packed", "bitmap"):
+            future = _decoded(future, result_format)
+        if return_mode in ("wait value", "value at action"):
+            return future.result()
+        if return_mode == "instand value":
+            return future.result() if future.done() else None
+        return future
 
-        def confirm(e):
-            fin([i.to_dict() for i in widget.tree.get_checked()])
+    def receiver_setup(recv: TkBgReceiver):
+        recv.child_provider = child_provider
+        if result_format in ("packed", "bitmap"):
+            recv.decode = lambda obj: decode_result(obj, result_format)
+        if handoff is not None:
+            recv.on_close.append(handoff.release)
+            if return_mode == "instand value":
+                # the receiver is not returned, closed as the popup ends
+                Thread(target=_close_at_exit, args=(recv,), daemon=True).start()
+        if records is not None:
+            Thread(target=_feed_records, args=(recv, records), daemon=True).start()
 
-        widget.confirm_button.bind("<Button-1>", confirm)
-        widget.confirm_button.bind("<Return>", confirm)
-        widget.confirm_button.bind("<space>", confirm)
-        root.bind("<Control-Return>", confirm)
-
-        if at_focus_out:
-            if at_focus_out == "confirm":
-                root.bind("<FocusOut>", lambda e: (confirm(None) if e.widget == root else None))
-            else:
-                root.bind("<FocusOut>", lambda e: (cancel(None) if e.widget == root else None))
-
-        if return_mode == "value at action":
+    try:
+        result = TkBgServer(
+            address=server_address,
+            port=server_port,
+            daemon=server_daemon,
+            instand_return=return_mode in ("wait value", "instand value", "value at action"),
+            instand_return_blocking=return_mode in ("wait value", "value at action"),
+            pool=server_pool,
+            transport=server_transport,
+            receiver_setup=receiver_setup,
+            start_method=server_start_method,
+            heartbeat=server_heartbeat,
+        )(_popup_make)(
+            *structure,
+            checked_iids=checked_iids,
+            check_mode=check_mode,
+            at_focus_out=at_focus_out,
+            window_mode=window_mode,
+            window_title=window_title,
+            window_height=window_height,
+            window_width=window_width,
+            return_mode=return_mode,
+            tags_config_update=tags_config_update,
+            ttk_styler=ttk_styler,
+            stream_events=stream_events,
+            load_children=child_provider is not None,
+            structure_handoff=handoff,
+            result_format=result_format,
+            result_fields=result_fields,
+            lazy_tree=lazy_tree,
+            stream_records=records is not None,
+            records_total=records_total,
+        )
+    except BaseException:
+        if handoff is not None:
+            handoff.release()
+        raise
+    if handoff is not None and return_mode in ("wait value", "value at action"):
+        handoff.release()
+    return result
 
-            def single_return(e):
-                if c := widget.tree.get_checked():
-                    fin([i.to_dict() for i in c])
-                else:
-                    fin(None)
 
-            widget.tree.bind("<Return>", single_return, add=True)
-            widget.tree.bind("<space>", single_return, add=True)
-            widget.tree.bind("<Button-1>", single_return, add=True)
-            widget.tree.bind("<Double-Button-1>", single_return, add=True)
-            widget.tree.bind("#", single_return, add=True)
+async def popup_async(
+        *structure: StructureNode,
+        return_mode: Literal["wait value", "value at action"] = "wait value",
+        timeout: float | None = None,
+        **popup_kwargs,
+) -> object:
+    from asyncio import CancelledError, TimeoutError as AsyncTimeoutError, wait_for, wrap_future
 
-        return root
+    if popup_kwargs.get("server_broker") is not None:
+        future = popup(
+            *structure,
+            return_mode="receiver" if return_mode == "wait value" else "receiver at action",
+            **popup_kwargs
+        )
+        try:
+            return await wait_for(wrap_future(future), timeout)
+        except (CancelledError, AsyncTimeoutError):
+            future.cancel()
+            raise
 
-    return func()
+    receiver = AsyncTkBgReceiver(popup(
+        *structure,
+        return_mode="receiver" if return_mode == "wait value" else "receiver at action",
+        **popup_kwargs
+    ))
+    try:
+        return await receiver.receive(timeout)
+    except (CancelledError, AsyncTimeoutError):
+        receiver.term_server()
+        raise
+    finally:
+        receiver.close()
 
 
 if __name__ == '__main__':
@@ -6,7 +6,7 @@ try:
 except:
     raise
 
-from v2.base.treeselect import StructureNode
+from v2.base.structure import StructureNode
 from v2.treeselectpopup import popup
 
 if __name__ == '__main__':